@@ -1,37 +1,55 @@
+import asyncio
+import os
 import random
-import uuid
+import threading
+import time
+from abc import ABCMeta
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 
+from .events import Event
+from .iban import IBANAllocator
+from .ids import IdGenerator
+from .journal import CREDIT, DEBIT, TRANSFER, Journal
+from .statements import export_statement
+from .transaction_log import PartyTable, TransactionLog
 
-class Account():
-    """Bank Account of a customer.
 
-    Args:
-        customer (str): Name of the customer.
-        bank (Bank): Bank-Object where you want to register the account.
-        init_balance(int, float): Optional. Starting balance of the account.
-            Defaults to 0.
+# Shared no-op context, used instead of locks while a bank is not concurrent.
+_NO_LOCK = nullcontext()
+
+
+class BaseAccount():
+    """Behaviour shared by all accounts, use Account or SlottedAccount.
+
+    Defines no attributes of its own, so subclasses decide between a
+    per-instance __dict__ (Account) and __slots__ (SlottedAccount).
 
     """
 
+    __slots__ = ()
+
     def __init__(self,
                  customer,
                  bank,
-                 init_balance=0):
+                 init_balance=0,
+                 _iban=None):
         assert isinstance(bank, Bank)
+        self.bank = bank
         self.bank_num = bank.bank_num
-        self.IBAN = self._create_new_IBAN()
+        self.IBAN = _iban or bank._iban_allocator.allocate()
         self.customer = customer
-        self.transactions = []
+        self.transactions = TransactionLog(bank._parties, self)
         self.credit_limit = 0
+        self._balance = 0
+        self._pending = 0
+        self._held = 0
+        self._holds = {}
 
         self._init_balance(init_balance)
         bank.add_account(self)
 
-    def _create_new_IBAN(self):
-        return "DE00{}{}".format(
-            self.bank_num, random.randrange(1000000000, 9999999999, 10)
-        )
-
     def _init_balance(self, init_balance):
         """Run to give Customer some initial money."""
         
@@ -39,25 +57,76 @@ class Account():
             self.deposit(init_balance)
 
     def _get_balance(self):
-        balance = sum(
-            [
-                transaction.get('amount')
-                for transaction in self.transactions
-                if transaction.get('executed') == True
-            ]
-        )
-        return balance
+        """Running balance, maintained by _add_transaction."""
+        return self._balance
 
     # Property is read only, if you only pass a getter method.
     balance = property(_get_balance)
 
-    def _add_transaction(self, transaction):
-        """Add a new transaction."""
-        self.transactions.append(transaction)
-        print("Added {}".format(transaction.__repr__()))
+    def _get_pending(self):
+        """Sum of all transactions that were not executed."""
+        return self._pending
+
+    pending = property(_get_pending)
+
+    def _get_held(self):
+        """Sum of all authorized amounts that are not captured or released yet."""
+        return self._held
+
+    held = property(_get_held)
+
+    def _get_available(self):
+        """Funds a withdrawal can use: balance plus credit limit minus holds."""
+        return self._balance + self.credit_limit - self._held
+
+    available = property(_get_available)
+
+    def balance_at(self, timestamp):
+        """Balance at a point in time, see TransactionLog.balance_at.
+
+        Args:
+            timestamp (float, datetime.datetime): Point in time.
+
+        """
+
+        return self.transactions.balance_at(timestamp)
+
+    def verify_balance(self):
+        """Recompute balance and pending totals from all transactions.
+
+        Meant for audits: runs in O(N) over the transaction history, while
+        the balance property itself is O(1).
+
+        Returns:
+            bool: True if the cached totals match the transaction history.
+
+        """
+
+        return (self.transactions.balance() == self._balance
+                and self.transactions.pending() == self._pending)
+
+    def _post(self, transaction_id, amount, sender, receiver, executed):
+        """Append a row, update the running totals and notify the bank's sinks."""
+        pos = self.transactions.append(transaction_id, amount, sender, receiver, executed)
+        if executed:
+            self._balance += amount
+        else:
+            self._pending += amount
+        if self.bank._sinks:
+            kind = 'deposit' if receiver is self else 'withdraw'
+            self.bank._emit(Event(kind, self.IBAN, amount, executed))
+        return pos
+
+    def _add_transaction(self, amount, sender, receiver, executed, transaction_id=None):
+        """Add a new one-sided transaction and journal it, with a new id by default."""
+        if transaction_id is None:
+            transaction_id = self.bank._ids.next_id()
+        pos = self._post(transaction_id, amount, sender, receiver, executed)
+        if self.bank._journal is not None:
+            self.bank._journal_transaction(self, pos)
         return self
 
-    def deposit(self, amount, sender = 'CASH'):
+    def deposit(self, amount, sender = 'CASH', _transaction_id=None):
         """Add money to bank account.
 
         Args:
@@ -67,59 +136,162 @@ class Account():
 
         """
 
-        deposit_dict = {
-                        'transaction_id': str(uuid.uuid1()),
-                        'amount': amount,
-                        'sender': sender,
-                        'receiver': self,
-                        'executed': True
-                        }
-        self._add_transaction(deposit_dict)
+        with self.bank._locked(self):
+            self._add_transaction(amount, sender, self, True, _transaction_id)
         return self
 
-    def withdraw(self, amount, receiver = 'CASH'):
+    def withdraw(self, amount, receiver = 'CASH', _transaction_id=None):
         """Withdraw money from bank account."""
 
-        withdraw_dict = {
-                        'transaction_id': str(uuid.uuid1()),
-                        'amount': amount *-1,
-                        'sender': self,
-                        'receiver': receiver,
-                        'executed': False
-                        }
-        
-        if  abs(amount) <= (self.balance 
-                                 + self.credit_limit):
-            withdraw_dict['executed'] = True
-            self._add_transaction(withdraw_dict)
-            return True
-        else:
-            print('Insufficient funds.')
-            self._add_transaction(withdraw_dict)
-            return False
+        with self.bank._locked(self):
+            if  (abs(amount) <= self.available
+                    and (not self.bank._rules or self.bank._allowed(self, abs(amount)))):
+                self._add_transaction(amount *-1, self, receiver, True, _transaction_id)
+                if self.bank._rules:
+                    self.bank._record(self, abs(amount))
+                return True
+            else:
+                self._add_transaction(amount *-1, self, receiver, False, _transaction_id)
+                return False
          
     def transfer(self, amount, receiver):
         """Transfer money from this Account to another account.
 
+        Both sides are posted with one shared transaction id, see Bank.transaction.
+
         Args:
             amount: Amount of money to draw from the account. Must be a positive number.
             receiver(Account): Account-Object of recipient.
 
         """
 
-        transfer_dict = {
-                         'transaction_id': str(uuid.uuid1()),
-                         'amount': amount,
-                         'sender': self,
-                         'receiver': receiver,
-                         'executed': False
-                        }
-        
-        if self.withdraw(amount, receiver = receiver):
-            receiver.deposit(amount, sender = self)
-        
+        self.bank._commit_legs([(self, receiver, amount)])
+        return self
+
+    def authorize(self, amount, receiver='CASH'):
+        """Reserve funds now and capture them later, e.g. for a card payment.
+
+        The hold reduces the available funds at once, in O(1), without
+        posting a transaction. Holds are not journaled. The bank's rules
+        count a hold as outgoing posting when it is authorized, not again
+        when it is captured.
+
+        Args:
+            amount: Amount of money to reserve. Must be a positive number.
+            receiver: Optional. Account-Object or label the money goes to on
+                capture. Defaults to "CASH".
+        Returns:
+            int: Id of the hold, used as transaction id on capture. None if
+                the available funds are not sufficient.
+
+        """
+
+        with self.bank._locked(self):
+            if abs(amount) > self.available:
+                return None
+            if self.bank._rules and not self.bank._allowed(self, abs(amount)):
+                return None
+            hold_id = self.bank._ids.next_id()
+            self._holds[hold_id] = (abs(amount), receiver)
+            self._held += abs(amount)
+            if self.bank._rules:
+                self.bank._record(self, abs(amount))
+        return hold_id
+
+    def capture(self, hold_id, amount=None):
+        """Post a held amount, the rest of the hold is released.
+
+        Args:
+            hold_id (int): Id returned by authorize.
+            amount: Optional. Amount to post, at most the held amount.
+                Defaults to the held amount.
+        Raises:
+            AssertionError: If the hold does not exist or amount exceeds it.
+
+        """
+
+        receiver = self._holds.get(hold_id, (0, None))[1]
+        with self.bank._locked(self, receiver):
+            assert hold_id in self._holds, 'Unknown hold {}'.format(hold_id)
+            held, receiver = self._holds[hold_id]
+            amount = held if amount is None else abs(amount)
+            assert amount <= held, 'Capture exceeds the held amount {}'.format(held)
+            del self._holds[hold_id]
+            self._held -= held
+            self.bank._post_legs([(self, receiver, amount)], [True], [hold_id], record=False)
         return self
 
+    def release(self, hold_id):
+        """Cancel a hold and return its amount to the available funds."""
+        with self.bank._locked(self):
+            assert hold_id in self._holds, 'Unknown hold {}'.format(hold_id)
+            held, _ = self._holds.pop(hold_id)
+            self._held -= held
+        return self
+
+    async def transfer_async(self, amount, receiver):
+        """Coroutine version of transfer, runs the transfer in a worker thread.
+
+        The bank must be in concurrency mode, see Bank.enable_concurrency.
+
+        Args:
+            amount: Amount of money to draw from the account. Must be a positive number.
+            receiver(Account): Account-Object of recipient.
+
+        """
+
+        assert self.bank._stripes is not None, 'transfer_async needs Bank.enable_concurrency()'
+        return await asyncio.to_thread(self.transfer, amount, receiver)
+
+    def query(self, counterparty=None, since=None, until=None, executed=None):
+        """Find transactions by counterparty, time range and executed status.
+
+        Uses the indexes of the transaction log, see TransactionLog.query.
+
+        Args:
+            counterparty: Optional. Account-Object or label like 'CASH'.
+            since (float, datetime.datetime): Optional. Earliest timestamp, inclusive.
+            until (float, datetime.datetime): Optional. Latest timestamp, exclusive.
+            executed (bool): Optional. Only executed (True) or failed (False) transactions.
+        Returns:
+            list: Matching transactions, oldest first.
+
+        """
+
+        return self.transactions.query(counterparty, since, until, executed)
+
+    def save_account_statement(self, path, fmt='csv', chunk_size=65536):
+        """Save all transactions of this account to path/{IBAN}.{fmt}.
+
+        Rows are formatted and written chunk by chunk, the history is never
+        materialized as a whole.
+
+        Args:
+            path (str): Directory to write the statement to.
+            fmt (str): Optional. 'csv' or 'parquet'. Parquet needs pyarrow.
+                Defaults to 'csv'.
+            chunk_size (int): Optional. Rows per written chunk. Defaults to 65536.
+        Returns:
+            str: Path of the written file.
+
+        """
+
+        return export_statement(path, self.IBAN, self.transactions.columns(),
+                                self.transactions.labels(), fmt, chunk_size)
+
+
+
+class Account(BaseAccount):
+    """Bank Account of a customer.
+
+    Args:
+        customer (str): Name of the customer.
+        bank (Bank): Bank-Object where you want to register the account.
+        init_balance(int, float): Optional. Starting balance of the account.
+            Defaults to 0.
+
+    """
+
 
 
 class Bank():
@@ -127,17 +299,39 @@ class Bank():
 
     Args:
         name (str): name of the bank.
+        node (int): Optional. Node of the transaction ids from 0 to 1023,
+            see ch3_scripts.ids.IdGenerator. Defaults to a different node for
+            each of up to 1024 banks of this process.
     Attributes:
         name (str): name of the bank.
         bank_num (int): Bank number create as a random number betwen 10000000 and 99999999.
         _accounts (dict): Dictionary holding the accounts of the format {iban: Account object}.
+        _by_customer (dict): Accounts per customer of the format {customer: [accounts]}.
+        _by_class (dict): Accounts per exact class of the format {class: [accounts]}.
+        _parties (PartyTable): Interned senders and receivers of all transactions.
+        _sinks (list): Subscribed event sinks, see ch3_scripts.events.
+        _rules (list): Velocity rules checked on outgoing postings, see
+            ch3_scripts.rules.
+        _journal (Journal): Journal of all postings, None if not persisted.
+        _iban_allocator (IBANAllocator): Source of unique IBANs with valid checksum.
+        _stripes (list): Lock stripes in concurrency mode, None otherwise.
+        _ids (IdGenerator): Source of the transaction ids.
 
     """
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, node=None):
         self.name = name
         self.bank_num = random.randrange(10000000, 99999999)
         self._accounts = {}
+        self._by_customer = {}
+        self._by_class = {}
+        self._parties = PartyTable()
+        self._sinks = []
+        self._rules = []
+        self._journal = None
+        self._iban_allocator = IBANAllocator(self.bank_num)
+        self._stripes = None
+        self._ids = IdGenerator(node)
 
     def add_account(self, account):
         """Add bank account to this bank. For creating a new account use the Account class.
@@ -149,12 +343,514 @@ class Bank():
 
         """
 
-        assert isinstance(account, Account)
+        assert isinstance(account, BaseAccount)
         iban = account.IBAN
         assert iban not in self._accounts, "IBAN already registered"
         self._accounts.update({iban: account})
+        self._by_customer.setdefault(account.customer, []).append(account)
+        self._by_class.setdefault(type(account), []).append(account)
+        self._parties.intern(account)
+        if self._journal is not None and len(self._journal.labels) < len(self._parties):
+            self._register_parties()
+        return self
+
+    def accounts_for(self, customer):
+        """Return all accounts of a customer, in the order they were opened."""
+        return list(self._by_customer.get(customer, ()))
+
+    def accounts_of_type(self, account_class):
+        """Return all accounts that are instances of account_class.
+
+        Looks only at the classes that have accounts in this bank, so the
+        cost is proportional to the result.
+
+        Args:
+            account_class (type): Account class, e.g. Savings. Accounts of
+                subclasses like Premium are included.
+        Returns:
+            list: Matching accounts, grouped by their exact class.
+
+        """
+
+        return [account
+                for cls, accounts in self._by_class.items() if issubclass(cls, account_class)
+                for account in accounts]
+
+    def open_accounts(self, customers, init_balances=None, account_class=None, ibans=None):
+        """Open many accounts in one call.
+
+        IBANs are allocated in one block and the initial balances are posted
+        as a single batch.
+
+        Args:
+            customers (iterable): Customer names, one account per name.
+            init_balances (iterable): Optional. Starting balance per account.
+            account_class (type): Optional. Account, SlottedAccount or a subclass.
+                Defaults to Account.
+            ibans (list): Optional. IBANs of the new accounts, e.g. handed out
+                by a ShardedBank. Defaults to new IBANs of this bank.
+        Returns:
+            list: The new accounts.
+
+        """
+
+        if account_class is None:
+            account_class = Account
+        customers = list(customers)
+        if ibans is None:
+            ibans = self._iban_allocator.allocate_many(len(customers))
+        assert len(ibans) == len(customers), "One IBAN per customer needed"
+        accounts = [account_class(customer, self, _iban=iban)
+                    for customer, iban in zip(customers, ibans)]
+        if init_balances is not None:
+            self.post_batch([('CASH', iban, balance)
+                             for iban, balance in zip(ibans, init_balances)
+                             if balance > 0])
+        return accounts
+
+    def enable_concurrency(self, stripes=64):
+        """Make postings of this bank safe for concurrent threads.
+
+        Every account maps to one of a fixed number of reentrant locks by the
+        hash of its IBAN. Operations lock all stripes they touch in ascending
+        stripe order, so two transfers can never wait on each other in a cycle.
+
+        Args:
+            stripes (int): Optional. Number of locks. Defaults to 64.
+
+        """
+
+        self._stripes = [threading.RLock() for _ in range(stripes)]
         return self
 
+    def _locked(self, *accounts):
+        """Return a context that holds the lock stripes of the accounts.
+
+        Every account is locked on the stripes of its own bank, so a transfer
+        into another bank also holds that bank's lock. Stripes are taken in
+        one global order by (id(bank), stripe) to avoid cycles across banks.
+
+        """
+
+        stripes = {}
+        for account in accounts:
+            if isinstance(account, BaseAccount):
+                bank = account.bank
+                if bank._stripes is not None:
+                    index = hash(account.IBAN) % len(bank._stripes)
+                    stripes[(id(bank), index)] = bank._stripes[index]
+        if not stripes:
+            return _NO_LOCK
+        return _StripeLock([stripes[key] for key in sorted(stripes)])
+
+    def _locked_all(self):
+        """Return a context that holds every lock stripe of this bank."""
+        if self._stripes is None:
+            return _NO_LOCK
+        return _StripeLock(self._stripes)
+
+    def subscribe(self, sink):
+        """Subscribe an event sink to the transactions of this bank.
+
+        Without subscribed sinks no events are created at all.
+
+        Args:
+            sink: Object with an emit(event) method, e.g. one of the sinks
+                in ch3_scripts.events.
+
+        """
+
+        self._sinks.append(sink)
+        return self
+
+    def unsubscribe(self, sink):
+        """Remove a previously subscribed event sink."""
+        self._sinks.remove(sink)
+        return self
+
+    def _emit(self, event):
+        for sink in self._sinks:
+            sink.emit(event)
+
+    def add_rule(self, rule):
+        """Check a rule on every outgoing posting of the accounts of this bank.
+
+        Postings rejected by a rule are recorded as not executed, like
+        withdrawals without sufficient funds.
+
+        Args:
+            rule: Object with allows() and record() methods, e.g. a
+                VelocityRule from ch3_scripts.rules.
+
+        """
+
+        self._rules.append(rule)
+        return self
+
+    def remove_rule(self, rule):
+        """Remove a previously added rule."""
+        self._rules.remove(rule)
+        return self
+
+    def _allowed(self, account, amount, count=0, total=0):
+        """Return True if all rules allow a posting of amount from account."""
+        now = time.time()
+        return all(rule.allows(account, amount, now, count, total) for rule in self._rules)
+
+    def _record(self, account, amount):
+        """Count an executed outgoing posting in all rules."""
+        now = time.time()
+        for rule in self._rules:
+            rule.record(account, amount, now)
+
+    def open_journal(self, directory, group_commit=1024):
+        """Persist all further postings of this bank in a new journal.
+
+        Current balances are written as the initial checkpoint.
+
+        Args:
+            directory (str): Journal directory, see ch3_scripts.journal.Journal.
+            group_commit (int): Optional. Records per fsync. Defaults to 1024.
+        Raises:
+            AssertionError: If the directory already holds a journal.
+
+        """
+
+        journal = Journal(directory, group_commit)
+        assert journal.count == 0 and not journal.labels, 'Journal already in use, use Bank.restore'
+        journal.write_meta(name=self.name, bank_num=self.bank_num,
+                           iban_seed=self._iban_allocator.seed)
+        self._journal = journal
+        self._register_parties()
+        journal.checkpoint(self._party_balances())
+        return self
+
+    @classmethod
+    def restore(cls, directory, group_commit=1024):
+        """Restore a bank and its balances from a journal directory.
+
+        Balances are rebuilt by scanning the journal records after the last
+        checkpoint. Transactions before the restart are not loaded into
+        Account.transactions, they are carried as opening balance.
+
+        Args:
+            directory (str): Journal directory written by open_journal.
+            group_commit (int): Optional. Records per fsync. Defaults to 1024.
+        Returns:
+            Bank: The restored bank, journaling further postings.
+
+        """
+
+        journal = Journal(directory, group_commit)
+        meta = journal.read_meta()
+        bank = cls(meta['name'])
+        bank.bank_num = meta['bank_num']
+        register = journal.read_register()
+        opened = sum(1 for _, _, class_name in register if class_name)
+        bank._iban_allocator = IBANAllocator(bank.bank_num, meta['iban_seed'], opened)
+        classes = {account_class.__name__: account_class for account_class in _account_classes()}
+        balances = journal.replay()
+        for index, (label, customer, class_name) in enumerate(register):
+            if class_name:
+                party = classes[class_name](customer, bank, _iban=label)
+                party._balance = balances[index]
+                party.transactions.opening_balance = balances[index]
+            else:
+                party = label
+            bank._parties.intern(party)
+        bank._journal = journal
+        return bank
+
+    def checkpoint(self):
+        """Commit the journal and snapshot all balances.
+
+        Holds all lock stripes, so the balances and the record count of the
+        snapshot cover exactly the same postings.
+
+        """
+
+        with self._locked_all():
+            self._journal.checkpoint(self._party_balances())
+        return self
+
+    def commit(self):
+        """Make all journaled postings durable."""
+        self._journal.commit()
+        return self
+
+    def export_journal_statement(self, iban, directory):
+        """Write the CSV statement of an IBAN, read from the journal.
+
+        Args:
+            iban (str): IBAN of the account.
+            directory (str): Target directory, the file is named {IBAN}.csv.
+
+        """
+
+        return self._journal.export_statement(iban, os.path.join(directory, '{}.csv'.format(iban)))
+
+    def export_all_statements(self, directory, fmt='csv', workers=None, chunk_size=65536):
+        """Save the statement of every account to directory, one file per IBAN.
+
+        Accounts are fanned out over a process pool. Workers only receive the
+        column arrays and party labels of their account.
+
+        Args:
+            directory (str): Target directory.
+            fmt (str): Optional. 'csv' or 'parquet'. Defaults to 'csv'.
+            workers (int): Optional. Number of worker processes, 1 exports in
+                this process. Defaults to the number of CPUs.
+            chunk_size (int): Optional. Rows per written chunk. Defaults to 65536.
+        Returns:
+            list: Paths of the written files.
+
+        """
+
+        if workers == 1:
+            return [account.save_account_statement(directory, fmt, chunk_size)
+                    for account in self._accounts.values()]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(export_statement, directory, iban,
+                            account.transactions.columns(),
+                            account.transactions.labels(), fmt, chunk_size)
+                for iban, account in self._accounts.items()
+            ]
+            return [future.result() for future in futures]
+
+    def _party_balances(self):
+        """Balances per party index, 0 for parties that are not accounts of this bank."""
+        return array('d', [
+            party.balance if isinstance(party, BaseAccount) and party.bank is self else 0.0
+            for party in self._parties.parties
+        ])
+
+    def _register_parties(self):
+        """Write all parties interned since the last call to the journal register."""
+        journal = self._journal
+        parties = self._parties.parties
+        with journal._lock:
+            for party in parties[len(journal.labels):]:
+                if isinstance(party, BaseAccount):
+                    own = party.bank is self
+                    journal.register(party.IBAN,
+                                     party.customer if own else '',
+                                     type(party).__name__ if own else '')
+                else:
+                    journal.register(str(party))
+
+    def _journal_legs(self, legs):
+        """Append one TRANSFER record per (id, sender, receiver, amount, executed) leg."""
+        intern = self._parties.intern
+        records = [
+            (TRANSFER, executed, transaction_id, intern(sender), intern(receiver),
+             amount, time.time())
+            for transaction_id, sender, receiver, amount, executed in legs
+        ]
+        if len(self._journal.labels) < len(self._parties):
+            self._register_parties()
+        self._journal.append_many(records)
+
+    def _journal_transaction(self, account, pos):
+        """Append row pos of the transactions of account to the journal."""
+        if len(self._journal.labels) < len(self._parties):
+            self._register_parties()
+        log = account.transactions
+        receiver = log._receivers[pos]
+        kind = CREDIT if self._parties[receiver] is account else DEBIT
+        self._journal.append(kind, log._executed[pos],
+                             log._ids[pos],
+                             log._senders[pos], receiver,
+                             log._amounts[pos], log._timestamps[pos])
+
+    def accrue_interest(self, rate_table=None, start=None, end=None):
+        """Credit interest to all interest bearing accounts in one batch.
+
+        Interest is computed from the cached balances of all accounts at once
+        and posted with post_batch. Without start and end one year of simple
+        interest is credited, like Savings.add_annual_interest. With a date
+        range, interest is compounded daily over the days in the range.
+        Accounts with a balance <= 0 get no interest.
+
+        Args:
+            rate_table (dict): Optional. Annual rate per account class of the
+                format {class: rate}. Subclasses use the rate of their closest
+                listed base class, slotted variants count as subclasses of
+                their dict-based class. Defaults to the interest_rate of each class.
+            start (datetime.date): Optional. First day of the accrual period.
+            end (datetime.date): Optional. Day after the accrual period.
+        Returns:
+            dict: Credited interest of the format {iban: amount}.
+
+        """
+
+        assert (start is None) == (end is None), 'start and end must be given together'
+        days = None if start is None else (end - start).days
+        factors = {}
+
+        def factor(account_class):
+            if account_class not in factors:
+                rate = None
+                if rate_table is None:
+                    for base in account_class.__mro__:
+                        rate = base.__dict__.get('interest_rate')
+                        if rate is not None:
+                            break
+                else:
+                    # issubclass instead of the __mro__ includes virtual
+                    # subclasses, e.g. SlottedSavings of Savings
+                    matches = [cls for cls in rate_table if issubclass(account_class, cls)]
+                    closest = [cls for cls in matches
+                               if not any(other is not cls and issubclass(other, cls)
+                                          for other in matches)]
+                    mro = account_class.__mro__
+                    closest.sort(key=lambda cls: mro.index(cls) if cls in mro else len(mro))
+                    if closest:
+                        rate = rate_table[closest[0]]
+                if rate is not None and days is not None:
+                    rate = (1 + rate / 365) ** days - 1
+                factors[account_class] = rate
+            return factors[account_class]
+
+        ibans = []
+        balances = []
+        rates = []
+        for iban, account in self._accounts.items():
+            rate = factor(type(account))
+            if rate is not None:
+                ibans.append(iban)
+                balances.append(account.balance)
+                rates.append(rate)
+
+        interest = [balance * rate for balance, rate in zip(balances, rates)]
+        credited = {iban: amount for iban, amount in zip(ibans, interest) if amount > 0}
+        self.post_batch([('CASH', iban, amount) for iban, amount in credited.items()])
+        return credited
+
+    def balances_at(self, timestamp):
+        """Balances of all accounts at a point in time.
+
+        Args:
+            timestamp (float, datetime.datetime): Point in time.
+        Returns:
+            array.array: Balances of type 'd' in the order of accounts.
+
+        """
+
+        return array('d', [account.transactions.balance_at(timestamp)
+                           for account in self._accounts.values()])
+
+    def post_batch(self, records):
+        """Post many deposits, withdrawals and transfers in one call.
+
+        Overdraft limits are checked for the whole batch in a single pass over
+        the cached balances, in record order, with the same outcome as calling
+        Account.transfer for every record.
+
+        Args:
+            records (iterable): Records of the form (sender_iban, receiver_iban, amount).
+                Use 'CASH' as sender_iban for a deposit and as receiver_iban
+                for a withdrawal.
+        Returns:
+            list: Executed mask, one bool per record.
+        Raises:
+            AssertionError: If an IBAN is not registered in this bank.
+
+        """
+
+        accounts = self._accounts
+        resolved = []
+        for sender_iban, receiver_iban, amount in records:
+            sender = 'CASH' if sender_iban == 'CASH' else accounts.get(sender_iban)
+            receiver = 'CASH' if receiver_iban == 'CASH' else accounts.get(receiver_iban)
+            assert sender is not None, "IBAN {} not registered".format(sender_iban)
+            assert receiver is not None, "IBAN {} not registered".format(receiver_iban)
+            resolved.append((sender, receiver, amount))
+
+        with self._locked(*(party for leg in resolved for party in leg[:2])):
+            mask = self._funds_mask(resolved)
+            self._post_legs(resolved, mask, [self._ids.next_id() for _ in resolved])
+        return mask
+
+    def transaction(self):
+        """Stage several legs and commit them atomically.
+
+        Use it as context manager. All legs are committed together when the
+        block ends, with one transaction id, one lock acquisition and one
+        journal write. Either every leg is executed or none is; debits of a
+        rejected transaction are recorded as not executed. If the block
+        raises, nothing is posted.
+
+            with bank.transaction() as txn:
+                txn.transfer(account1, account2, 50)
+                txn.withdraw(account2, 20)
+
+        Returns:
+            BankTransaction: The staged transaction.
+
+        """
+
+        return BankTransaction(self)
+
+    def _funds_mask(self, resolved):
+        """Executed flag per (sender, receiver, amount) leg, checked in order."""
+        available = {}
+        counted = {}
+        mask = []
+        for sender, receiver, amount in resolved:
+            executed = True
+            if sender != 'CASH':
+                funds = available.get(sender)
+                if funds is None:
+                    funds = sender.available
+                executed = abs(amount) <= funds
+                if executed and sender.bank._rules:
+                    # legs of this batch are not recorded in the rules yet
+                    count, total = counted.get(sender, (0, 0))
+                    executed = sender.bank._allowed(sender, abs(amount), count, total)
+                    if executed:
+                        counted[sender] = (count + 1, total + abs(amount))
+                if executed:
+                    funds -= abs(amount)
+                available[sender] = funds
+            if executed and receiver != 'CASH':
+                funds = available.get(receiver)
+                if funds is None:
+                    funds = receiver.available
+                available[receiver] = funds + amount
+            mask.append(executed)
+        return mask
+
+    def _commit_legs(self, legs):
+        """Commit legs all or nothing with one shared id, return True if executed."""
+        with self._locked(*(party for leg in legs for party in leg[:2])):
+            executed = all(self._funds_mask(legs))
+            transaction_id = self._ids.next_id()
+            self._post_legs(legs, [executed] * len(legs), [transaction_id] * len(legs))
+        return executed
+
+    def _post_legs(self, legs, mask, transaction_ids, record=True):
+        """Post both sides of validated legs and journal every leg once.
+
+        With record=False the executed legs are not counted in the rules
+        again, e.g. captured holds that were counted at authorization.
+
+        """
+        journaled = {}
+        for (sender, receiver, amount), executed, transaction_id in zip(legs, mask, transaction_ids):
+            if sender != 'CASH':
+                sender._post(transaction_id, amount * -1, sender, receiver, executed)
+                if executed and record and sender.bank._rules:
+                    sender.bank._record(sender, abs(amount))
+            if executed and receiver != 'CASH':
+                receiver._post(transaction_id, amount, sender, receiver, True)
+            for bank in {party.bank for party in (sender, receiver) if party != 'CASH'}:
+                if bank._journal is not None:
+                    journaled.setdefault(bank, []).append(
+                        (transaction_id, sender, receiver, amount, executed))
+        for bank, records in journaled.items():
+            bank._journal_legs(records)
+
     def _get_accounts(self):
         """Getter for the property 'account'"""
         return self._accounts
@@ -163,27 +859,159 @@ class Bank():
     
 
 
-class Savings(Account):
-    """Savings Account, adds interest to the normal Account."""
+class BankTransaction():
+    """Legs staged within Bank.transaction(), committed atomically on exit.
+
+    Args:
+        bank (Bank): Bank committing the transaction.
+    Attributes:
+        legs (list): Staged legs of the format (sender, receiver, amount).
+        executed (bool): Result of the commit, None before.
+
+    """
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.legs = []
+        self.executed = None
+
+    def transfer(self, sender, receiver, amount):
+        """Stage a transfer between two accounts."""
+        assert self.executed is None, 'Transaction already committed'
+        self.legs.append((sender, receiver, amount))
+        return self
+
+    def deposit(self, account, amount):
+        """Stage a cash deposit."""
+        return self.transfer('CASH', account, amount)
+
+    def withdraw(self, account, amount):
+        """Stage a cash withdrawal."""
+        return self.transfer(account, 'CASH', amount)
+
+    def commit(self):
+        """Commit all staged legs, return True if they were executed."""
+        assert self.executed is None, 'Transaction already committed'
+        self.executed = self.bank._commit_legs(self.legs) if self.legs else True
+        return self.executed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.legs = []
+
+
+class SavingsMixin(BaseAccount):
+    """Interest of Savings and SlottedSavings, defines no attributes of its own."""
+
+    __slots__ = ()
 
     interest_rate = 0.05
 
     def add_annual_interest(self):
-        self.deposit(self.balance * Savings.interest_rate)
+        self.deposit(self.balance * self.interest_rate)
         return self
 
 
-class CreditCard(Account):
-    """CreditCard Account, extends Account with a credit limit"""
+class CreditCardMixin(BaseAccount):
+    """Credit limit of CreditCard and SlottedCreditCard, defines no attributes of its own."""
+
+    __slots__ = ()
+
+    # not called credit_limit, a class attribute would hide the slot of SlottedAccount
+    default_credit_limit = 1000
 
-    credit_limit = 1000
+    def __init__(self, customer, bank, init_balance=0, _iban=None):
+        super().__init__(customer, bank, init_balance, _iban)
+        self.credit_limit = self.default_credit_limit
+
+
+class Savings(SavingsMixin, Account, metaclass=ABCMeta):
+    """Savings Account, adds interest to the normal Account."""
+
+    pass
+
+
+class CreditCard(CreditCardMixin, Account, metaclass=ABCMeta):
+    """CreditCard Account, extends Account with a credit limit"""
 
-    def __init__(self, customer, bank, init_balance=0):
-        super().__init__(customer, bank, init_balance)
-        self.credit_limit = CreditCard.credit_limit
+    credit_limit = CreditCardMixin.default_credit_limit
 
 
 class Premium(Savings, CreditCard):
     """Combine functionality of Savings and CreditCard"""
 
     pass
+
+
+class SlottedAccount(BaseAccount):
+    """Account without per-instance __dict__, same public attributes as Account.
+
+    Use it for banks holding millions of accounts. Attributes that are not
+    declared in __slots__ cannot be added to instances.
+
+    Args:
+        customer (str): Name of the customer.
+        bank (Bank): Bank-Object where you want to register the account.
+        init_balance(int, float): Optional. Starting balance of the account.
+            Defaults to 0.
+
+    """
+
+    __slots__ = ('bank', 'bank_num', 'IBAN', 'customer', 'transactions',
+                 'credit_limit', '_balance', '_pending', '_held', '_holds',
+                 '__weakref__')
+
+
+class SlottedSavings(SavingsMixin, SlottedAccount):
+    """Slotted variant of Savings."""
+
+    __slots__ = ()
+
+
+class SlottedCreditCard(CreditCardMixin, SlottedAccount):
+    """Slotted variant of CreditCard."""
+
+    __slots__ = ()
+
+
+class SlottedPremium(SlottedSavings, SlottedCreditCard):
+    """Slotted variant of Premium."""
+
+    __slots__ = ()
+
+
+# the slotted variants count as Savings, CreditCard and Premium for
+# isinstance, accounts_of_type and accrue_interest
+Savings.register(SlottedSavings)
+CreditCard.register(SlottedCreditCard)
+Premium.register(SlottedPremium)
+
+
+class _StripeLock():
+    """Context manager acquiring locks in the given order."""
+
+    __slots__ = ('locks',)
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+def _account_classes(cls=BaseAccount):
+    """Yield BaseAccount and all of its subclasses."""
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _account_classes(subclass)
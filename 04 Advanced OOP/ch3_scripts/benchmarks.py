@@ -0,0 +1,265 @@
+"""Benchmark suite for ch3_scripts.bank_accounts.
+
+Run from the directory containing ch3_scripts:
+
+    python -m ch3_scripts.benchmarks --output results.json
+    python -m ch3_scripts.benchmarks --baseline results.json --threshold 0.2
+
+Every benchmark is run at every scale and reports seconds per operation.
+With --baseline the run fails with exit code 1 if a metric got slower than
+baseline * (1 + threshold). --memory adds the per-account and
+per-transaction memory footprint, measured with tracemalloc.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+from .bank_accounts import Bank, Account, Savings, SlottedAccount
+from .sharding import throughput
+from .transaction_log import PartyTable, Transaction, TransactionLog
+
+
+DEFAULT_SCALES = (1000, 100000, 1000000)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark function under name.
+
+    A benchmark takes the scale n and returns (seconds, operations) of its
+    timed part. Setup is not timed.
+
+    """
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def _funded_accounts(n, bank=None, balance=10 ** 9):
+    bank = bank if bank is not None else Bank('bench')
+    return bank, bank.open_accounts(['customer {}'.format(i) for i in range(n)], [balance] * n)
+
+
+@benchmark('deposit')
+def bench_deposit(n):
+    bank, (account,) = _funded_accounts(1)
+    start = time.perf_counter()
+    for _ in range(n):
+        account.deposit(1)
+    return time.perf_counter() - start, n
+
+
+@benchmark('withdraw')
+def bench_withdraw(n):
+    bank, (account,) = _funded_accounts(1)
+    start = time.perf_counter()
+    for _ in range(n):
+        account.withdraw(1)
+    return time.perf_counter() - start, n
+
+
+@benchmark('transfer')
+def bench_transfer(n):
+    bank, (sender, receiver) = _funded_accounts(2)
+    start = time.perf_counter()
+    for _ in range(n):
+        sender.transfer(1, receiver)
+    return time.perf_counter() - start, n
+
+
+@benchmark('balance_after_n')
+def bench_balance_after_n(n):
+    bank, (account,) = _funded_accounts(1)
+    for _ in range(n):
+        account.deposit(1)
+    reads = 10000
+    start = time.perf_counter()
+    for _ in range(reads):
+        account.balance
+    return time.perf_counter() - start, reads
+
+
+@benchmark('open_accounts')
+def bench_open_accounts(n):
+    bank = Bank('bench')
+    customers = ['customer {}'.format(i) for i in range(n)]
+    start = time.perf_counter()
+    bank.open_accounts(customers, [100] * n)
+    return time.perf_counter() - start, n
+
+
+@benchmark('accrue_interest')
+def bench_accrue_interest(n):
+    bank = Bank('bench')
+    bank.open_accounts(['customer {}'.format(i) for i in range(n)], [100] * n,
+                       account_class=Savings)
+    start = time.perf_counter()
+    bank.accrue_interest()
+    return time.perf_counter() - start, n
+
+
+@benchmark('concurrent_transfers')
+def bench_concurrent_transfers(n, threads=4, accounts=16):
+    """Random transfers from several threads, checks that no update is lost."""
+    bank = Bank('bench').enable_concurrency()
+    bank, population = _funded_accounts(accounts, bank, balance=100)
+    per_thread = max(n // threads, 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            sender, receiver = rng.sample(population, 2)
+            sender.transfer(rng.randint(1, 50), receiver)
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(account.balance for account in population)
+    assert total == 100 * accounts, 'Lost update: total {} != {}'.format(total, 100 * accounts)
+    assert all(account.balance >= 0 for account in population), 'Account overdrawn'
+    return elapsed, per_thread * threads
+
+
+@benchmark('sharded_transfers')
+def bench_sharded_transfers(n, shards=2):
+    """Random transfers on a ShardedBank, see ch3_scripts.sharding for scaling runs."""
+    return n / throughput(shards, n, accounts=100), n
+
+
+def _allocated(build):
+    """Return (bytes allocated while build() runs, result of build())."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def memory_footprint(n=10000):
+    """Measure bytes per account and per transaction with tracemalloc.
+
+    Compares Account against SlottedAccount, and transaction dicts (the
+    former format) against Transaction records and TransactionLog rows.
+
+    Returns:
+        dict: Bytes per object of the format {name: bytes}.
+
+    """
+
+    footprint = {}
+    for account_class in (Account, SlottedAccount):
+        bank = Bank('bench')
+        customers = ['customer {}'.format(i) for i in range(n)]
+        size, _ = _allocated(lambda: bank.open_accounts(customers, account_class=account_class))
+        footprint['account/{}'.format(account_class.__name__)] = size / n
+
+    parties = ['CASH', object()]
+    ids = [uuid.uuid1().int >> 64 for _ in range(n)]
+    size, _ = _allocated(lambda: [
+        {'transaction_id': str(uuid.UUID(int=i << 64)), 'amount': 1.0, 'sender': parties[0],
+         'receiver': parties[1], 'executed': True}
+        for i in ids])
+    footprint['transaction/dict'] = size / n
+    size, _ = _allocated(lambda: [
+        Transaction(i, 1.0, parties[0], parties[1], True, 0.0) for i in ids])
+    footprint['transaction/Transaction'] = size / n
+
+    def fill_log():
+        log = TransactionLog(PartyTable())
+        for i in ids:
+            log.append(i, 1.0, parties[0], parties[1], True, 0.0)
+        return log
+    size, _ = _allocated(fill_log)
+    footprint['transaction/TransactionLog'] = size / n
+    return footprint
+
+
+def run(names=None, scales=DEFAULT_SCALES, repeat=3):
+    """Run benchmarks and return {'name@n': {'seconds_per_op': ..., ...}}."""
+    results = {}
+    for name in names or BENCHMARKS:
+        for n in scales:
+            best = None
+            for _ in range(repeat):
+                seconds, operations = BENCHMARKS[name](n)
+                per_op = seconds / operations
+                best = per_op if best is None else min(best, per_op)
+            results['{}@{}'.format(name, n)] = {'seconds_per_op': best, 'n': n}
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """Return the metrics that regressed by more than threshold against baseline.
+
+    Returns:
+        list: Tuples (key, baseline seconds_per_op, current seconds_per_op).
+
+    """
+
+    regressions = []
+    for key, result in results.items():
+        if key in baseline:
+            before = baseline[key]['seconds_per_op']
+            after = result['seconds_per_op']
+            if after > before * (1 + threshold):
+                regressions.append((key, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for ch3_scripts.bank_accounts')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--scales', nargs='+', type=int, default=list(DEFAULT_SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline, 0.2 = 20%%')
+    parser.add_argument('--memory', action='store_true',
+                        help='also measure bytes per account and per transaction')
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.scales, args.repeat)
+    for key, result in results.items():
+        print('{:<32} {:>12.3f} us/op'.format(key, result['seconds_per_op'] * 1e6))
+
+    output = {'python': platform.python_version(), 'results': results}
+    if args.memory:
+        output['memory'] = memory_footprint()
+        for key, size in output['memory'].items():
+            print('{:<32} {:>12.1f} bytes'.format(key, size))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after in regressions:
+            print('REGRESSION {}: {:.3f} us/op -> {:.3f} us/op'.format(key, before * 1e6, after * 1e6))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
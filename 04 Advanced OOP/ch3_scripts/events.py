@@ -0,0 +1,98 @@
+import logging
+import queue
+import threading
+from collections import Counter, deque, namedtuple
+
+
+# Raw event as emitted by the accounts. Formatting is left to the sinks.
+Event = namedtuple('Event', ['kind', 'iban', 'amount', 'executed'])
+
+
+class RingBufferSink():
+    """Keep the most recent events in memory.
+
+    Args:
+        maxlen (int): Optional. Number of events to keep. Defaults to 1000.
+    Attributes:
+        events (collections.deque): The most recent events, oldest first.
+
+    """
+
+    def __init__(self, maxlen=1000):
+        self.events = deque(maxlen=maxlen)
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+class CounterSink():
+    """Count events by kind and executed status.
+
+    Attributes:
+        counts (collections.Counter): Counts of the format {(kind, executed): n}.
+
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def emit(self, event):
+        self.counts[(event.kind, event.executed)] += 1
+
+
+class BufferedLogSink():
+    """Collect raw events and write them to a logger in batches.
+
+    Events are only formatted when the buffer is handed off, either because
+    it reached its capacity or because flush() was called. A full buffer is
+    passed to a background thread that formats and logs it, so the posting
+    thread never waits for the logger.
+
+    Args:
+        logger (logging.Logger): Optional. Target logger. Defaults to the
+            logger of this module.
+        capacity (int): Optional. Number of events to buffer. Defaults to 1000.
+        level (int): Optional. Log level of the records. Defaults to logging.INFO.
+
+    """
+
+    def __init__(self, logger=None, capacity=1000, level=logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.capacity = capacity
+        self.level = level
+        self._buffer = []
+        self._batches = queue.Queue()
+        self._writer = threading.Thread(target=self._write, name='BufferedLogSink', daemon=True)
+        self._writer.start()
+
+    def emit(self, event):
+        self._buffer.append(event)
+        if len(self._buffer) >= self.capacity:
+            buffer, self._buffer = self._buffer, []
+            self._batches.put(buffer)
+
+    def flush(self):
+        """Hand off the buffered events and wait until all batches are logged."""
+        buffer, self._buffer = self._buffer, []
+        if buffer:
+            self._batches.put(buffer)
+        self._batches.join()
+
+    def close(self):
+        """Log the buffered events and stop the background thread."""
+        self.flush()
+        self._batches.put(None)
+        self._writer.join()
+
+    def _write(self):
+        """Main loop of the background thread, formats and logs every batch."""
+        while True:
+            buffer = self._batches.get()
+            try:
+                if buffer is None:
+                    break
+                if self.logger.isEnabledFor(self.level):
+                    for event in buffer:
+                        self.logger.log(self.level, '%s %s %s executed=%s', *event)
+            finally:
+                self._batches.task_done()
@@ -0,0 +1,93 @@
+import random
+import threading
+
+
+# Account numbers are the 10 digit tail of a German IBAN.
+ACCOUNT_SPACE = 10 ** 10
+# The Feistel network permutes 34 bit numbers, the smallest even width >= ACCOUNT_SPACE.
+HALF_BITS = 17
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+def iban_check_digits(country, bban):
+    """Compute the two ISO 13616 check digits of an IBAN.
+
+    Args:
+        country (str): Two letter country code, e.g. 'DE'.
+        bban (str): Basic bank account number, bank code followed by account number.
+    Returns:
+        str: Two digit checksum.
+
+    """
+
+    digits = ''.join(str(int(char, 36)) for char in bban + country) + '00'
+    return '{:02d}'.format(98 - int(digits) % 97)
+
+
+def make_iban(bank_num, account_number, country='DE'):
+    """Build an IBAN from an 8 digit bank number and a 10 digit account number."""
+    bban = '{:08d}{:010d}'.format(bank_num, account_number)
+    return '{}{}{}'.format(country, iban_check_digits(country, bban), bban)
+
+
+def is_valid_iban(iban):
+    """Return True if the check digits of iban are valid."""
+    if len(iban) < 5 or not iban.isalnum():
+        return False
+    rearranged = iban[4:] + iban[:4]
+    return int(''.join(str(int(char, 36)) for char in rearranged)) % 97 == 1
+
+
+class IBANAllocator():
+    """Hands out unique IBANs for one bank in O(1).
+
+    A counter is mapped through a keyed Feistel permutation of the 10 digit
+    account number space, so consecutive accounts get unrelated looking
+    numbers but never the same one twice.
+
+    Args:
+        bank_num (int): 8 digit bank number.
+        seed (int): Optional. Key of the permutation. Defaults to a random key.
+        counter (int): Optional. Number of IBANs handed out before. Defaults to 0.
+    Attributes:
+        seed (int): Key of the permutation, needed to continue after a restart.
+        counter (int): Number of IBANs handed out.
+
+    """
+
+    def __init__(self, bank_num, seed=None, counter=0):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.bank_num = bank_num
+        self.seed = seed
+        self.counter = counter
+        self._lock = threading.Lock()
+        self._keys = [(seed >> (16 * i)) & 0xFFFF | (i + 1) << 16 for i in range(ROUNDS)]
+
+    def _feistel(self, number):
+        left, right = number >> HALF_BITS, number & HALF_MASK
+        for key in self._keys:
+            mixed = ((right ^ key) * 0x9E3779B1 + (right >> 5)) & 0xFFFFFFFF
+            left, right = right, left ^ (mixed >> 7) & HALF_MASK
+        return (left << HALF_BITS) | right
+
+    def account_number(self, index):
+        """Map index in [0, ACCOUNT_SPACE) to a unique account number."""
+        assert 0 <= index < ACCOUNT_SPACE, 'Account number space exhausted'
+        number = self._feistel(index)
+        # cycle walking keeps the permutation inside ACCOUNT_SPACE
+        while number >= ACCOUNT_SPACE:
+            number = self._feistel(number)
+        return number
+
+    def allocate(self):
+        """Return the next unused IBAN."""
+        with self._lock:
+            index = self.counter
+            self.counter += 1
+        return make_iban(self.bank_num, self.account_number(index))
+
+    def allocate_many(self, n):
+        """Return a list of the next n unused IBANs."""
+        return [self.allocate() for _ in range(n)]
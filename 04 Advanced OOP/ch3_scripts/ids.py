@@ -0,0 +1,66 @@
+import itertools
+import os
+import threading
+import time
+
+
+# Milliseconds since 2024-01-01 UTC fit 41 bits until 2093.
+EPOCH_MS = 1704067200000
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+NODE_MASK = (1 << NODE_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+# Default nodes: consecutive per generator, starting at the process id.
+_next_node = itertools.count(os.getpid())
+
+
+class IdGenerator():
+    """Snowflake-style 64-bit transaction ids: time, node and sequence.
+
+    Ids are integers that increase with time, so sorting by id sorts by
+    creation time. Ids from generators with different nodes never collide.
+    More than 4096 ids in one millisecond borrow from the next millisecond
+    instead of waiting, the same happens if the system clock goes back.
+
+    Args:
+        node (int): Optional. Node number from 0 to 1023, must differ between
+            generators writing to the same ledger. Defaults to the next of
+            consecutive nodes starting at the process id, so generators of
+            one process differ. Pass explicit nodes to be unique across
+            processes.
+
+    """
+
+    def __init__(self, node=None):
+        if node is None:
+            node = next(_next_node) & NODE_MASK
+        assert 0 <= node <= NODE_MASK, 'node must be between 0 and {}'.format(NODE_MASK)
+        self.node = node
+        self._last = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        """Return a new unique id."""
+        with self._lock:
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now <= self._last:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last += 1
+                now = self._last
+            else:
+                self._sequence = 0
+                self._last = now
+            return (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node << SEQUENCE_BITS) | self._sequence
+
+
+def format_id(transaction_id):
+    """Format an id for export as 16 hex digits."""
+    return '{:016x}'.format(transaction_id)
+
+
+def id_timestamp(transaction_id):
+    """Return the unix time in seconds encoded in an id."""
+    return ((transaction_id >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000
@@ -0,0 +1,255 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from .ids import format_id
+
+
+# Record kinds. A debit belongs to the sender, a credit to the receiver and
+# a transfer to both sides.
+DEBIT = 1
+CREDIT = 2
+TRANSFER = 3
+
+# kind, executed, padding, id, sender index, receiver index, amount, timestamp
+RECORD = struct.Struct('<BB6xQqqdd')
+# magic, version, number of records
+HEADER = struct.Struct('<8sQQ')
+HEADER_SIZE = 64
+MAGIC = b'BANKJRNL'
+VERSION = 2
+
+JOURNAL_FILE = 'journal.bin'
+REGISTER_FILE = 'accounts.csv'
+SNAPSHOT_FILE = 'snapshot.bin'
+META_FILE = 'bank.json'
+
+
+class Journal():
+    """Append-only journal of fixed-width binary records, written via mmap.
+
+    The journal lives in one directory per bank:
+
+    * journal.bin: header plus one RECORD per posting.
+    * accounts.csv: register of all interned parties, the line number is the
+      party index used in the records.
+    * snapshot.bin: balances per party index at a checkpoint and the number
+      of records the checkpoint covers.
+    * bank.json: name and bank number.
+
+    Records become durable on commit(). With group commit the mapped pages are
+    flushed once every group_commit records instead of once per record.
+
+    Args:
+        directory (str): Journal directory, created if it does not exist.
+        group_commit (int): Optional. Commit after this many records.
+            Defaults to 1024.
+        chunk_records (int): Optional. Number of records the file grows by.
+            Defaults to 65536.
+    Attributes:
+        labels (list): IBAN or label of every registered party.
+        count (int): Number of records in the journal.
+
+    """
+
+    def __init__(self, directory, group_commit=1024, chunk_records=65536):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.group_commit = group_commit
+        self.chunk_records = chunk_records
+        self.labels = []
+        self._uncommitted = 0
+        self._lock = threading.RLock()
+
+        path = os.path.join(directory, JOURNAL_FILE)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0).ljust(HEADER_SIZE, b'\0'))
+                f.truncate(HEADER_SIZE + chunk_records * RECORD.size)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, self.count = HEADER.unpack_from(self._map, 0)
+        assert magic == MAGIC and version == VERSION, 'Not a bank journal: {}'.format(path)
+
+        register_path = os.path.join(directory, REGISTER_FILE)
+        if os.path.exists(register_path):
+            with open(register_path, newline='') as f:
+                self.labels = [row[0] for row in csv.reader(f)]
+        self._register = open(register_path, 'a', newline='')
+        self._register_writer = csv.writer(self._register)
+
+    def _grow(self):
+        """Extend the file by chunk_records records and map it again."""
+        size = len(self._map)
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(size + self.chunk_records * RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def register(self, label, customer='', class_name=''):
+        """Register a party, its index is its position in the register.
+
+        Args:
+            label (str): IBAN of an account or a label like 'CASH'.
+            customer (str): Optional. Customer name of an account of this bank.
+            class_name (str): Optional. Class name of an account of this bank.
+                Empty for parties that are not accounts of this bank.
+
+        """
+
+        with self._lock:
+            self._register_writer.writerow([label, customer, class_name])
+            self.labels.append(label)
+
+    def read_register(self):
+        """Return all register rows as [label, customer, class_name]."""
+        self._register.flush()
+        with open(os.path.join(self.directory, REGISTER_FILE), newline='') as f:
+            return list(csv.reader(f))
+
+    def append(self, kind, executed, transaction_id, sender, receiver, amount, timestamp):
+        """Append one record, commit when the group is full."""
+        with self._lock:
+            offset = HEADER_SIZE + self.count * RECORD.size
+            if offset + RECORD.size > len(self._map):
+                self._grow()
+            RECORD.pack_into(self._map, offset, kind, executed, transaction_id,
+                             sender, receiver, amount, timestamp)
+            self.count += 1
+            self._uncommitted += 1
+            if self._uncommitted >= self.group_commit:
+                self.commit()
+
+    def append_many(self, records):
+        """Append records (kind, executed, id, sender, receiver, amount, timestamp) at once."""
+        with self._lock:
+            while HEADER_SIZE + (self.count + len(records)) * RECORD.size > len(self._map):
+                self._grow()
+            offset = HEADER_SIZE + self.count * RECORD.size
+            for record in records:
+                RECORD.pack_into(self._map, offset, *record)
+                offset += RECORD.size
+            self.count += len(records)
+            self._uncommitted += len(records)
+            if self._uncommitted >= self.group_commit:
+                self.commit()
+
+    def commit(self):
+        """Publish the record count and flush records and register to disk."""
+        with self._lock:
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.count)
+            self._map.flush()
+            self._register.flush()
+            os.fsync(self._register.fileno())
+            self._uncommitted = 0
+
+    def checkpoint(self, balances):
+        """Commit and write a snapshot of the balances per party index.
+
+        Args:
+            balances (array.array): Balances of type 'd', one per party index.
+
+        """
+
+        self.commit()
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(struct.pack('<QQ', self.count, len(balances)))
+            balances.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _read_snapshot(self):
+        """Return (records covered, balances) of the last checkpoint."""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        balances = array('d')
+        if not os.path.exists(path):
+            return 0, balances
+        with open(path, 'rb') as f:
+            count, n = struct.unpack('<QQ', f.read(16))
+            balances.fromfile(f, n)
+        return count, balances
+
+    def records(self, start=0):
+        """Iterate over the raw record tuples from position start on."""
+        end = HEADER_SIZE + self.count * RECORD.size
+        view = memoryview(self._map)[HEADER_SIZE + start * RECORD.size:end]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def replay(self):
+        """Rebuild the executed balance of every party index.
+
+        Starts from the last checkpoint and scans the mapped records after it.
+
+        Returns:
+            array.array: Balances of type 'd', one per registered party.
+
+        """
+
+        start, balances = self._read_snapshot()
+        if len(balances) < len(self.labels):
+            balances.extend([0.0] * (len(self.labels) - len(balances)))
+        for kind, executed, _, sender, receiver, amount, _ in self.records(start):
+            if not executed:
+                continue
+            if kind == TRANSFER:
+                balances[sender] -= amount
+                balances[receiver] += amount
+            else:
+                balances[sender if kind == DEBIT else receiver] += amount
+        return balances
+
+    def statement_rows(self, iban):
+        """Yield the statement rows of one IBAN from the journal.
+
+        Rows are (transaction_id, amount, sender, receiver, executed, timestamp)
+        with sender and receiver given as labels.
+
+        """
+
+        index = self.labels.index(iban)
+        labels = self.labels
+        for kind, executed, transaction_id, sender, receiver, amount, timestamp in self.records():
+            if kind == TRANSFER:
+                if sender == index:
+                    yield (format_id(transaction_id), -amount, labels[sender],
+                           labels[receiver], bool(executed), timestamp)
+                if receiver == index and executed:
+                    yield (format_id(transaction_id), amount, labels[sender],
+                           labels[receiver], True, timestamp)
+            elif (sender if kind == DEBIT else receiver) == index:
+                yield (format_id(transaction_id), amount, labels[sender],
+                       labels[receiver], bool(executed), timestamp)
+
+    def export_statement(self, iban, path):
+        """Write the CSV statement of one IBAN, built from the journal."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['transaction_id', 'amount', 'sender', 'receiver', 'executed', 'timestamp'])
+            writer.writerows(self.statement_rows(iban))
+        return path
+
+    def write_meta(self, **meta):
+        """Store bank metadata in bank.json."""
+        with open(os.path.join(self.directory, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    def read_meta(self):
+        """Return the bank metadata from bank.json."""
+        with open(os.path.join(self.directory, META_FILE)) as f:
+            return json.load(f)
+
+    def close(self):
+        """Commit and release the mapping and the files."""
+        self.commit()
+        self._map.close()
+        self._file.close()
+        self._register.close()
@@ -0,0 +1,199 @@
+"""Load generator for ch3_scripts.bank_accounts.
+
+Generates a reproducible workload, replays it against a fresh bank and
+reports p50/p99 latency per operation. Run from the directory containing
+ch3_scripts:
+
+    python -m ch3_scripts.loadgen --accounts 10000 --operations 200000 --skew 1.1
+    python -m ch3_scripts.loadgen --rate 20000 --mix deposit=1 transfer=4 balance=5
+    python -m ch3_scripts.loadgen --save workload.json
+    python -m ch3_scripts.loadgen --workload workload.json --profile loadgen.prof
+
+The same seed always gives the same workload. Accounts are picked with a
+Zipf-like skew: account i is chosen with weight 1 / (i + 1) ** skew, 0 means
+uniform. --profile writes cProfile stats, to be read with pstats or
+snakeviz; for py-spy, run `py-spy record -- python -m ch3_scripts.loadgen`.
+"""
+
+import argparse
+import cProfile
+import itertools
+import json
+import random
+import sys
+import time
+
+from .bank_accounts import Bank, Account, SlottedAccount, _account_classes
+
+
+OPERATIONS = ('deposit', 'withdraw', 'transfer', 'balance')
+DEFAULT_MIX = {'deposit': 0.3, 'withdraw': 0.3, 'transfer': 0.3, 'balance': 0.1}
+
+
+def generate(accounts=1000, operations=100000, mix=None, skew=1.0,
+             max_amount=100, init_balance=1000, seed=0):
+    """Generate a workload.
+
+    Args:
+        accounts (int): Optional. Number of accounts. Defaults to 1000.
+        operations (int): Optional. Number of operations. Defaults to 100000.
+        mix (dict): Optional. Relative weight per operation of the format
+            {operation: weight}. Defaults to DEFAULT_MIX.
+        skew (float): Optional. Zipf exponent of the account popularity.
+            Defaults to 1.0.
+        max_amount (int): Optional. Largest amount of an operation. Defaults to 100.
+        init_balance (int): Optional. Starting balance per account. Defaults to 1000.
+        seed (int): Optional. Random seed. Defaults to 0.
+    Returns:
+        dict: JSON serializable workload with the keys 'accounts',
+            'init_balance' and 'operations', a list of
+            [operation, account, counterparty, amount].
+
+    """
+
+    mix = mix or DEFAULT_MIX
+    assert set(mix) <= set(OPERATIONS), 'Operations must be in {}'.format(OPERATIONS)
+    assert accounts >= 2, 'At least two accounts needed for transfers'
+    rng = random.Random(seed)
+    names = list(mix)
+    ops = rng.choices(names, [mix[name] for name in names], k=operations)
+    weights = list(itertools.accumulate(1 / (i + 1) ** skew for i in range(accounts)))
+    population = range(accounts)
+    picks = rng.choices(population, cum_weights=weights, k=operations)
+    counterparties = rng.choices(population, cum_weights=weights, k=operations)
+    workload = []
+    for op, account, counterparty in zip(ops, picks, counterparties):
+        if counterparty == account:
+            counterparty = (account + 1) % accounts
+        workload.append([op, account, counterparty, rng.randint(1, max_amount)])
+    return {'accounts': accounts, 'init_balance': init_balance, 'operations': workload}
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0 to 100) of values, nearest rank."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(int(round(q / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def replay(workload, rate=None, account_class=None, profiler=None):
+    """Replay a workload against a new bank.
+
+    Without rate, operations run back to back and latency is the service
+    time. With rate, operation k is scheduled at k / rate seconds after the
+    start and latency is measured from its scheduled time, so a stalled
+    operation also shows in the latency of the ones queued behind it.
+
+    Args:
+        workload (dict): Workload as returned by generate.
+        rate (float): Optional. Target operations per second.
+        account_class (type): Optional. Account class of the population.
+        profiler (cProfile.Profile): Optional. Enabled during the replay only.
+    Returns:
+        tuple: Latencies in seconds per operation of the format
+            {operation: [seconds]} and the seconds the replay took.
+
+    """
+
+    n = workload['accounts']
+    bank = Bank('loadgen')
+    accounts = bank.open_accounts(['customer {}'.format(i) for i in range(n)],
+                                  [workload['init_balance']] * n, account_class)
+    latencies = {op: [] for op in OPERATIONS}
+    clock = time.perf_counter
+    if profiler is not None:
+        profiler.enable()
+    start = clock()
+    for k, (op, account, counterparty, amount) in enumerate(workload['operations']):
+        if rate:
+            scheduled = start + k / rate
+            delay = scheduled - clock()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            scheduled = clock()
+        account = accounts[account]
+        if op == 'deposit':
+            account.deposit(amount)
+        elif op == 'withdraw':
+            account.withdraw(amount)
+        elif op == 'transfer':
+            account.transfer(amount, accounts[counterparty])
+        else:
+            account.balance
+        latencies[op].append(clock() - scheduled)
+    elapsed = clock() - start
+    if profiler is not None:
+        profiler.disable()
+    return latencies, elapsed
+
+
+def report(latencies):
+    """Summarize latencies as {operation: {'count', 'p50_us', 'p99_us'}}."""
+    summary = {}
+    for op, values in latencies.items():
+        if values:
+            summary[op] = {'count': len(values),
+                           'p50_us': percentile(values, 50) * 1e6,
+                           'p99_us': percentile(values, 99) * 1e6}
+    return summary
+
+
+def _parse_mix(items):
+    mix = {}
+    for item in items:
+        op, _, weight = item.partition('=')
+        mix[op] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    classes = {cls.__name__: cls for cls in _account_classes()
+               if issubclass(cls, (Account, SlottedAccount))}
+    parser = argparse.ArgumentParser(description='Load generator for ch3_scripts.bank_accounts')
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--operations', type=int, default=100000)
+    parser.add_argument('--mix', nargs='+', metavar='OP=WEIGHT',
+                        help='operation weights, e.g. deposit=1 transfer=3')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent, 0 = uniform')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rate', type=float, help='target operations per second')
+    parser.add_argument('--account-class', choices=sorted(classes), default='Account')
+    parser.add_argument('--workload', help='replay this JSON workload instead of generating one')
+    parser.add_argument('--save', help='write the workload to this JSON file')
+    parser.add_argument('--profile', help='write cProfile stats of the replay to this file')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    if args.workload:
+        with open(args.workload) as f:
+            workload = json.load(f)
+    else:
+        workload = generate(args.accounts, args.operations,
+                            _parse_mix(args.mix) if args.mix else None, args.skew, seed=args.seed)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(workload, f)
+
+    profiler = cProfile.Profile() if args.profile else None
+    latencies, elapsed = replay(workload, args.rate, classes[args.account_class], profiler)
+    summary = report(latencies)
+
+    operations = len(workload['operations'])
+    print('{} operations in {:.2f} s, {:.0f} ops/s'.format(operations, elapsed, operations / elapsed))
+    for op, stats in summary.items():
+        print('{:<10} {:>9} ops  p50 {:>9.2f} us  p99 {:>9.2f} us'.format(
+            op, stats['count'], stats['p50_us'], stats['p99_us']))
+
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'elapsed': elapsed, 'operations': summary}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+from array import array
+
+
+class SlidingWindow():
+    """Count and sum of the amounts posted within a sliding time window.
+
+    The window is a wheel of buckets, each covering window / buckets
+    seconds. Moving the window clears the buckets that fell out of it, so
+    adding and reading are O(1) amortized, independent of the history. The
+    window is exact to one bucket width.
+
+    Args:
+        window (float): Length of the window in seconds.
+        buckets (int): Optional. Number of buckets. Defaults to 60.
+    Attributes:
+        count (int): Number of postings in the window.
+        total (float): Sum of the amounts in the window.
+
+    """
+
+    __slots__ = ('width', 'count', 'total', '_head', '_counts', '_totals')
+
+    def __init__(self, window, buckets=60):
+        self.width = window / buckets
+        self.count = 0
+        self.total = 0
+        self._head = None
+        self._counts = array('q', [0] * buckets)
+        self._totals = array('d', [0.0] * buckets)
+
+    def advance(self, now):
+        """Move the window to end at now and drop the expired buckets."""
+        bucket = int(now // self.width)
+        head = self._head
+        if head is not None and bucket <= head:
+            return self
+        n = len(self._counts)
+        if head is None or bucket - head >= n:
+            self._counts = array('q', [0] * n)
+            self._totals = array('d', [0.0] * n)
+            self.count = 0
+            self.total = 0
+        else:
+            for expired in range(head + 1, bucket + 1):
+                index = expired % n
+                self.count -= self._counts[index]
+                self.total -= self._totals[index]
+                self._counts[index] = 0
+                self._totals[index] = 0.0
+        self._head = bucket
+        return self
+
+    def add(self, amount, now):
+        """Add one posting of amount at time now."""
+        self.advance(now)
+        index = self._head % len(self._counts)
+        self._counts[index] += 1
+        self._totals[index] += amount
+        self.count += 1
+        self.total += amount
+        return self
+
+
+class VelocityRule():
+    """Limit the outgoing postings of every account within a time window.
+
+    Withdrawals, transfers and captured holds count as outgoing postings.
+    A posting is rejected if it would exceed max_count postings or
+    max_amount in total within the window.
+
+        bank.add_rule(VelocityRule('withdrawals', 600, max_count=5))
+        bank.add_rule(VelocityRule('daily amount', 86400, max_amount=2000))
+
+    Args:
+        name (str): Name of the rule.
+        window (float): Length of the window in seconds.
+        max_count (int): Optional. Maximum number of postings in the window.
+        max_amount (float): Optional. Maximum sum of the amounts in the window.
+        buckets (int): Optional. Resolution of the window, see SlidingWindow.
+            Defaults to 60.
+    Attributes:
+        rejected (int): Number of postings rejected by this rule.
+
+    """
+
+    def __init__(self, name, window, max_count=None, max_amount=None, buckets=60):
+        assert max_count is not None or max_amount is not None, \
+            'Give max_count, max_amount or both'
+        self.name = name
+        self.window = window
+        self.max_count = max_count
+        self.max_amount = max_amount
+        self.buckets = buckets
+        self.rejected = 0
+        self._windows = {}
+
+    def allows(self, account, amount, now, count=0, total=0):
+        """Return True if one more posting of amount keeps account within the limits.
+
+        Args:
+            account (Account): Sending account.
+            amount (float): Positive amount of the posting.
+            now (float): Unix time of the posting.
+            count (int): Optional. Postings of the same batch not recorded yet.
+            total (float): Optional. Their sum.
+
+        """
+
+        window = self._windows.get(account)
+        if window is not None:
+            window.advance(now)
+            count += window.count
+            total += window.total
+        allowed = ((self.max_count is None or count + 1 <= self.max_count)
+                   and (self.max_amount is None or total + amount <= self.max_amount))
+        if not allowed:
+            self.rejected += 1
+        return allowed
+
+    def record(self, account, amount, now):
+        """Count an executed posting of account."""
+        window = self._windows.get(account)
+        if window is None:
+            window = self._windows[account] = SlidingWindow(self.window, self.buckets)
+        window.add(amount, now)
@@ -0,0 +1,379 @@
+"""Bank partitioned over worker processes.
+
+Every shard is a process owning a Bank with a part of the accounts. An
+account lives on shard crc32(IBAN) % shards. The ShardedBank in the parent
+process only routes messages, so postings on different shards run in
+parallel on different cores.
+
+Measure the throughput per number of shards with:
+
+    python -m ch3_scripts.sharding --shards 1 2 4 --transfers 200000
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import zlib
+
+from .bank_accounts import Bank, Account, _account_classes
+from .iban import IBANAllocator
+
+
+def shard_of(iban, shards):
+    """Return the shard number of an IBAN."""
+    return zlib.crc32(iban.encode()) % shards
+
+
+def _post(bank, records):
+    """Post records whose sender is an account of bank or 'CASH'.
+
+    A receiver that is not an account of bank is another shard's account:
+    the amount is withdrawn to its IBAN and credited there in phase two,
+    under the same transaction id.
+
+    A record that raises stops the batch. The records posted before it
+    are returned with the error, so the caller can still refund their
+    cross-shard debits.
+
+    Returns:
+        tuple: Executed mask, per record the transaction id of an executed
+            cross-shard debit or None, and the error that stopped the batch
+            or None.
+
+    """
+
+    accounts = bank._accounts
+    mask = []
+    debits = []
+    try:
+        for sender_iban, receiver_iban, amount in records:
+            debit = None
+            if sender_iban == 'CASH':
+                accounts[receiver_iban].deposit(amount)
+                executed = True
+            else:
+                sender = accounts[sender_iban]
+                receiver = accounts.get(receiver_iban)
+                if receiver is None:
+                    transaction_id = bank._ids.next_id()
+                    executed = sender.withdraw(amount, receiver_iban, _transaction_id=transaction_id)
+                    if executed:
+                        debit = transaction_id
+                else:
+                    executed = bank._commit_legs([(sender, receiver, amount)])
+            mask.append(executed)
+            debits.append(debit)
+    except Exception as error:
+        return mask, debits, error
+    return mask, debits, None
+
+
+def _credit(bank, records):
+    """Phase two of cross-shard transfers: credit the receivers.
+
+    Records are of the form (transaction_id, sender_iban, receiver_iban, amount).
+    All receivers are looked up before the first deposit, so an unknown
+    IBAN fails the whole message and credits nothing.
+
+    """
+
+    accounts = bank._accounts
+    receivers = [accounts[receiver_iban] for _, _, receiver_iban, _ in records]
+    for receiver, (transaction_id, sender_iban, _, amount) in zip(receivers, records):
+        receiver.deposit(amount, sender_iban, _transaction_id=transaction_id)
+
+
+def _refund(bank, records):
+    """Abort cross-shard transfers: re-credit the senders under the debit's id."""
+    accounts = bank._accounts
+    for transaction_id, sender_iban, receiver_iban, amount in records:
+        accounts[sender_iban].deposit(amount, receiver_iban, _transaction_id=transaction_id)
+
+
+def _serve(name, bank_num, node, inbox, outbox):
+    """Main loop of a shard process, answers every message on outbox."""
+    bank = Bank(name, node)
+    bank.bank_num = bank_num
+    accounts = bank._accounts
+    classes = {account_class.__name__: account_class for account_class in _account_classes()}
+    while True:
+        op, payload = inbox.get()
+        if op == 'stop':
+            break
+        try:
+            if op == 'open':
+                customers, ibans, init_balances, class_name = payload
+                bank.open_accounts(customers, init_balances, classes[class_name], ibans)
+                result = None
+            elif op == 'post':
+                result = _post(bank, payload)
+            elif op == 'credit':
+                result = _credit(bank, payload)
+            elif op == 'refund':
+                result = _refund(bank, payload)
+            elif op == 'balances':
+                result = {iban: accounts[iban].balance for iban in (payload or accounts)}
+            elif op == 'verify':
+                result = all(account.verify_balance() for account in accounts.values())
+            else:
+                raise ValueError('Unknown message {}'.format(op))
+        except Exception as error:
+            outbox.put(('error', error))
+        else:
+            outbox.put(('ok', result))
+
+
+class ShardedBank():
+    """Bank whose accounts are spread over worker processes.
+
+    Transfers within a shard are posted by that shard directly. A transfer
+    between shards is routed in two phases: the sender's shard checks the
+    funds and withdraws the amount to the receiver's IBAN, then the
+    receiver's shard credits every transfer that was executed, under the
+    transaction id of the debit. If a shard fails in either phase, the
+    debits that were not credited are refunded to their senders. Funds that
+    arrive from another shard can be spent from the next post_batch on.
+
+    Use it as context manager or call close() to stop the processes.
+
+    Args:
+        name (str): name of the bank.
+        shards (int): Optional. Number of worker processes. Defaults to the
+            number of CPUs.
+    Attributes:
+        name (str): name of the bank.
+        bank_num (int): Bank number shared by all shards.
+        shards (int): Number of worker processes.
+        _ibans (set): IBANs of all accounts, to reject unknown IBANs early.
+        _iban_allocator (IBANAllocator): Source of unique IBANs for all shards.
+        _inboxes (list): Message queue per shard.
+        _outboxes (list): Answer queue per shard.
+        _processes (list): Shard processes.
+
+    """
+
+    def __init__(self, name, shards=None):
+        self.name = name
+        self.bank_num = random.randrange(10000000, 99999999)
+        self.shards = shards or os.cpu_count() or 1
+        self._ibans = set()
+        self._iban_allocator = IBANAllocator(self.bank_num)
+        self._inboxes = []
+        self._outboxes = []
+        self._processes = []
+        for shard in range(self.shards):
+            inbox = multiprocessing.Queue()
+            outbox = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_serve, args=(name, self.bank_num, shard, inbox, outbox), daemon=True)
+            process.start()
+            self._inboxes.append(inbox)
+            self._outboxes.append(outbox)
+            self._processes.append(process)
+
+    def _gather(self, messages):
+        """Send {shard: (op, payload)} to all shards at once and gather the answers.
+
+        Returns:
+            tuple: Answer per shard that succeeded of the format {shard: result}
+                and the first error raised in a shard or None.
+
+        """
+
+        for shard, message in messages.items():
+            self._inboxes[shard].put(message)
+        results = {}
+        error = None
+        for shard in messages:
+            status, result = self._outboxes[shard].get()
+            if status == 'error':
+                error = error or result
+            else:
+                results[shard] = result
+        return results, error
+
+    def _call(self, messages):
+        """Like _gather, but raise the first error of a shard.
+
+        Returns:
+            dict: Answer per shard of the format {shard: result}.
+        Raises:
+            Exception: The first error raised in a shard.
+
+        """
+
+        results, error = self._gather(messages)
+        if error is not None:
+            raise error
+        return results
+
+    def open_accounts(self, customers, init_balances=None, account_class=Account):
+        """Open many accounts, each on the shard its IBAN belongs to.
+
+        Args:
+            customers (iterable): Customer names, one account per name.
+            init_balances (iterable): Optional. Starting balance per account.
+            account_class (type): Optional. Account, SlottedAccount or a subclass.
+                Defaults to Account.
+        Returns:
+            list: The IBANs of the new accounts.
+
+        """
+
+        customers = list(customers)
+        ibans = self._iban_allocator.allocate_many(len(customers))
+        if init_balances is None:
+            init_balances = [0] * len(customers)
+        batches = {}
+        for customer, iban, balance in zip(customers, ibans, init_balances):
+            batch = batches.setdefault(shard_of(iban, self.shards), ([], [], []))
+            batch[0].append(customer)
+            batch[1].append(iban)
+            batch[2].append(balance)
+        self._call({shard: ('open', batch + (account_class.__name__,))
+                    for shard, batch in batches.items()})
+        self._ibans.update(ibans)
+        return ibans
+
+    def post_batch(self, records):
+        """Post many deposits, withdrawals and transfers across the shards.
+
+        Args:
+            records (iterable): Records of the form (sender_iban, receiver_iban, amount).
+                Use 'CASH' as sender_iban for a deposit and as receiver_iban
+                for a withdrawal.
+        Returns:
+            list: Executed mask, one bool per record.
+        Raises:
+            AssertionError: If an IBAN is not registered in this bank.
+            Exception: The first error raised in a shard, after the
+                cross-shard debits that were not credited are refunded.
+
+        """
+
+        records = list(records)
+        shards = self.shards
+        batches = {}
+        positions = {}
+        crossing = []
+        for i, (sender_iban, receiver_iban, amount) in enumerate(records):
+            for iban in (sender_iban, receiver_iban):
+                assert iban == 'CASH' or iban in self._ibans, "IBAN {} not registered".format(iban)
+            if sender_iban == 'CASH':
+                shard = shard_of(receiver_iban, shards)
+            else:
+                shard = shard_of(sender_iban, shards)
+                if receiver_iban != 'CASH':
+                    receiver_shard = shard_of(receiver_iban, shards)
+                    if receiver_shard != shard:
+                        crossing.append((i, receiver_shard))
+            batches.setdefault(shard, []).append(records[i])
+            positions.setdefault(shard, []).append(i)
+
+        # phase one: local postings and debits of cross-shard transfers
+        mask = [False] * len(records)
+        debits = {}
+        results, error = self._gather({shard: ('post', batch) for shard, batch in batches.items()})
+        for shard, (shard_mask, shard_debits, shard_error) in results.items():
+            error = error or shard_error
+            for i, executed, debit in zip(positions[shard], shard_mask, shard_debits):
+                mask[i] = executed
+                if debit is not None:
+                    debits[i] = debit
+
+        # phase two: credit the executed cross-shard transfers under the debit's id
+        credits = {}
+        for i, shard in crossing:
+            if i in debits:
+                credits.setdefault(shard, []).append((debits[i],) + tuple(records[i]))
+        if credits and error is None:
+            results, error = self._gather({shard: ('credit', batch)
+                                           for shard, batch in credits.items()})
+            credits = {shard: batch for shard, batch in credits.items() if shard not in results}
+
+        # abort: refund the debits that were not credited
+        if error is not None:
+            refunds = {}
+            for batch in credits.values():
+                for credit in batch:
+                    refunds.setdefault(shard_of(credit[1], shards), ('refund', []))[1].append(credit)
+            if refunds:
+                self._call(refunds)
+            raise error
+        return mask
+
+    def transfer(self, sender_iban, receiver_iban, amount):
+        """Transfer amount between two accounts, return True if executed."""
+        return self.post_batch([(sender_iban, receiver_iban, amount)])[0]
+
+    def balances(self, ibans=None):
+        """Return the balances of the format {iban: balance}, all accounts by default."""
+        if ibans is None:
+            messages = {shard: ('balances', None) for shard in range(self.shards)}
+        else:
+            messages = {}
+            for iban in ibans:
+                messages.setdefault(shard_of(iban, self.shards), ('balances', []))[1].append(iban)
+        balances = {}
+        for result in self._call(messages).values():
+            balances.update(result)
+        return balances
+
+    def verify_balances(self):
+        """Recompute all cached balances on all shards, see Account.verify_balance."""
+        return all(self._call({shard: ('verify', None) for shard in range(self.shards)}).values())
+
+    def close(self):
+        """Stop the shard processes."""
+        for inbox in self._inboxes:
+            inbox.put(('stop', None))
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def __len__(self):
+        return len(self._ibans)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def throughput(shards, transfers=100000, accounts=1000, batch=10000, seed=0):
+    """Return executed transfers per second of a ShardedBank with random transfers.
+
+    Opening the accounts and starting the processes is not timed.
+
+    """
+
+    rng = random.Random(seed)
+    with ShardedBank('bench', shards) as bank:
+        ibans = bank.open_accounts(['customer {}'.format(i) for i in range(accounts)],
+                                   [10 ** 9] * accounts)
+        records = [tuple(rng.sample(ibans, 2)) + (1,) for _ in range(transfers)]
+        start = time.perf_counter()
+        for offset in range(0, transfers, batch):
+            bank.post_batch(records[offset:offset + batch])
+        elapsed = time.perf_counter() - start
+    return transfers / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Transfer throughput of a ShardedBank')
+    parser.add_argument('--shards', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--transfers', type=int, default=100000)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=10000)
+    args = parser.parse_args(argv)
+    for shards in args.shards:
+        rate = throughput(shards, args.transfers, args.accounts, args.batch)
+        print('{:>3} shards {:>12.0f} transfers/s'.format(shards, rate))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
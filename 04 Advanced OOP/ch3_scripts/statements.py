@@ -0,0 +1,94 @@
+import csv
+import os
+
+from .ids import format_id
+
+
+# Columns of an account statement.
+HEADER = ('transaction_id', 'amount', 'sender', 'receiver', 'executed', 'timestamp')
+FORMATS = ('csv', 'parquet')
+
+
+def party_label(party):
+    """Return the IBAN of an account or the party itself as string."""
+    return getattr(party, 'IBAN', None) or str(party)
+
+
+def statement_chunks(columns, labels, chunk_size=65536):
+    """Yield the rows of a statement in lists of at most chunk_size rows.
+
+    Args:
+        columns (tuple): Columns as returned by TransactionLog.columns().
+        labels (dict): Label per party index, see TransactionLog.labels().
+        chunk_size (int): Optional. Rows per chunk. Defaults to 65536.
+
+    """
+
+    ids, amounts, senders, receivers, executed, timestamps = columns
+    for start in range(0, len(amounts), chunk_size):
+        stop = start + chunk_size
+        yield [
+            (format_id(transaction_id), amount, labels[sender],
+             labels[receiver], bool(flag), timestamp)
+            for transaction_id, amount, sender, receiver, flag, timestamp in zip(
+                ids[start:stop], amounts[start:stop],
+                senders[start:stop], receivers[start:stop],
+                executed[start:stop], timestamps[start:stop])
+        ]
+
+
+def write_statement(path, chunks, fmt='csv'):
+    """Write statement chunks to path, one chunk at a time.
+
+    Args:
+        path (str): Target file.
+        chunks (iterable): Lists of rows, e.g. from statement_chunks.
+        fmt (str): Optional. 'csv' or 'parquet'. Parquet needs pyarrow.
+            Defaults to 'csv'.
+    Raises:
+        AssertionError: If fmt is not supported.
+        ImportError: If fmt is 'parquet' and pyarrow is not installed.
+
+    """
+
+    assert fmt in FORMATS, 'fmt must be one of {}'.format(FORMATS)
+    if fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            for chunk in chunks:
+                writer.writerows(chunk)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("Writing parquet statements requires pyarrow") from error
+    schema = pa.schema([
+        ('transaction_id', pa.string()),
+        ('amount', pa.float64()),
+        ('sender', pa.string()),
+        ('receiver', pa.string()),
+        ('executed', pa.bool_()),
+        ('timestamp', pa.float64()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            if chunk:
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type)
+                     for column, field in zip(zip(*chunk), schema)],
+                    schema=schema))
+    return path
+
+
+def export_statement(directory, iban, columns, labels, fmt='csv', chunk_size=65536):
+    """Write the statement {iban}.{fmt} to directory and return its path.
+
+    Only takes picklable arguments, so it can run in a worker process.
+
+    """
+
+    path = os.path.join(directory, '{}.{}'.format(iban, fmt))
+    return write_statement(path, statement_chunks(columns, labels, chunk_size), fmt)
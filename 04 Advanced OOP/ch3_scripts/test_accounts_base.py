@@ -41,9 +41,23 @@ def test_transfer(accounts):
     assert accounts[1].balance == 90
 
 
-# # Addition 1:
-# import os
-# from shutil import rmtree
+def test_verify_balance(accounts):
+    """Test that the running balance matches a full rescan."""
+    accounts[0].withdraw(10)
+    accounts[0].withdraw(500)
+    accounts[0].transfer(30, accounts[1])
+    assert accounts[0].balance == 60
+    assert accounts[0].pending == -500
+    assert accounts[0].verify_balance()
+    assert accounts[1].verify_balance()
+    accounts[0]._balance += 1
+    assert not accounts[0].verify_balance()
+
+
+# Addition 1:
+import csv
+import os
+from shutil import rmtree
 
 # # Global scoped SetUp-Method
 # @pytest.fixture(scope="module")
@@ -52,22 +66,52 @@ def test_transfer(accounts):
 #     os.mkdir(path)
 #     return path
 
-# # Revision 1:
-# # Global scoped SetUp with TearDown   
-# @pytest.fixture(scope="module")
-# def temp_folder():
-#     path = "./temp_files"
-#     os.mkdir(path)
-#     yield path
-#     rmtree(path)
-
-# # Addition 1
-# def test_save_account_statement(temp_folder, accounts):
-#     accounts[0].withdraw(10)
-#     accounts[0].deposit(5)
-#     accounts[0].transfer(50, accounts[1])
-#     accounts[1].transfer(20, accounts[0])
-#     accounts[0].save_account_statement(temp_folder)
-#     temp_files = os.listdir(temp_folder)
-#     assert "{}.csv".format(accounts[0].IBAN) in temp_files
+# Revision 1:
+# Global scoped SetUp with TearDown   
+@pytest.fixture(scope="module")
+def temp_folder():
+    path = "./temp_files"
+    os.mkdir(path)
+    yield path
+    rmtree(path)
+
+# Addition 1
+def test_save_account_statement(temp_folder, accounts):
+    accounts[0].withdraw(10)
+    accounts[0].deposit(5)
+    accounts[0].transfer(50, accounts[1])
+    accounts[1].transfer(20, accounts[0])
+    accounts[0].save_account_statement(temp_folder)
+    temp_files = os.listdir(temp_folder)
+    assert "{}.csv".format(accounts[0].IBAN) in temp_files
 
+
+def test_save_account_statement_content(tmp_path, accounts):
+    """Test the rows of a statement written in small chunks."""
+    accounts[0].transfer(50, accounts[1])
+    path = accounts[0].save_account_statement(str(tmp_path), chunk_size=1)
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [float(row['amount']) for row in rows] == [100, -50]
+    assert rows[1]['receiver'] == accounts[1].IBAN
+    assert rows[0]['sender'] == 'CASH'
+
+
+def test_save_account_statement_parquet(tmp_path, accounts):
+    """Test parquet statements, needs pyarrow."""
+    pq = pytest.importorskip('pyarrow.parquet')
+    accounts[0].withdraw(10)
+    path = accounts[0].save_account_statement(str(tmp_path), fmt='parquet')
+    assert pq.read_table(path).column('amount').to_pylist() == [100, -10]
+
+
+def test_export_all_statements(tmp_path):
+    """Test exporting one statement per IBAN with a process pool."""
+    export_bank = Bank("Export-Bank")
+    account1 = Account("Tina Test", export_bank, 100)
+    account2 = Account("Tareq Test", export_bank, 40)
+    account1.transfer(30, account2)
+    paths = export_bank.export_all_statements(str(tmp_path), workers=2)
+    assert sorted(os.listdir(str(tmp_path))) == sorted(
+        ["{}.csv".format(account1.IBAN), "{}.csv".format(account2.IBAN)])
+    assert len(paths) == 2
@@ -1,5 +1,8 @@
+import datetime
+
 import pytest
-from ch3_scripts.bank_accounts import Bank, Account
+from ch3_scripts.bank_accounts import (Bank, Account, CreditCard, Savings, Premium,
+                                       SlottedAccount, SlottedCreditCard, SlottedPremium)
 
 
 def test_add_account():
@@ -34,3 +37,212 @@ def test_get_account_read_only():
     account = Account('Petra May', bank, 50)
     with pytest.raises(AttributeError):
         bank.accounts = {account.IBAN: account}
+
+
+def test_post_batch():
+    """Test method post_batch with deposits, withdrawals and transfers."""
+    bank = Bank('test_bank')
+    account1 = Account('Petra May', bank, 50)
+    account2 = Account('Jim Gordon', bank)
+    card = CreditCard('Selina Kyle', bank)
+    mask = bank.post_batch([
+        (account1.IBAN, account2.IBAN, 30),
+        (account1.IBAN, account2.IBAN, 30),
+        (account2.IBAN, 'CASH', 10),
+        ('CASH', account1.IBAN, 5),
+        (card.IBAN, account1.IBAN, 900),
+        (card.IBAN, 'CASH', 200),
+    ])
+    assert mask == [True, False, True, True, True, False]
+    assert account1.balance == 925
+    assert account2.balance == 20
+    assert card.balance == -900
+    assert account1.transactions[2].get('executed') == False
+    assert all(account.verify_balance() for account in (account1, account2, card))
+
+
+def test_post_batch_unknown_iban():
+    """Test that post_batch rejects unregistered IBANs before posting anything."""
+    bank = Bank('test_bank')
+    account = Account('Petra May', bank, 50)
+    with pytest.raises(AssertionError):
+        bank.post_batch([(account.IBAN, 'CASH', 10), ('DE00unknown', 'CASH', 10)])
+    assert account.balance == 50
+
+
+def test_accrue_interest():
+    """Test interest accrual for all Savings and Premium accounts."""
+    bank = Bank('test_bank')
+    account = Account('Petra May', bank, 100)
+    savings = Savings('Jim Gordon', bank, 200)
+    premium = Premium('Selina Kyle', bank, 1000)
+    broke = Premium('Oswald Cobblepot', bank)
+    broke.withdraw(50)
+    credited = bank.accrue_interest()
+    assert credited == {savings.IBAN: 10, premium.IBAN: 50}
+    assert account.balance == 100
+    assert savings.balance == 210
+    assert broke.balance == -50
+
+    credited = bank.accrue_interest({Savings: 0.1, Premium: 0.0})
+    assert credited == {savings.IBAN: pytest.approx(21)}
+
+
+def test_accrue_interest_daily():
+    """Test daily compounded interest over a date range."""
+    bank = Bank('test_bank')
+    savings = Savings('Jim Gordon', bank, 1000)
+    credited = bank.accrue_interest({Savings: 0.0365},
+                                    datetime.date(2024, 1, 1),
+                                    datetime.date(2024, 1, 11))
+    assert credited[savings.IBAN] == pytest.approx(1000 * (1.0001 ** 10 - 1))
+    with pytest.raises(AssertionError):
+        bank.accrue_interest(start=datetime.date(2024, 1, 1))
+
+
+def test_slotted_accounts():
+    """Test that slotted accounts behave like their dict-based counterparts."""
+    bank = Bank('test_bank')
+    account = SlottedAccount('Petra May', bank, 50)
+    card = SlottedCreditCard('Selina Kyle', bank)
+    premium = SlottedPremium('Bruce Wayne', bank, 100)
+    assert not hasattr(account, '__dict__')
+    assert not hasattr(premium, '__dict__')
+    assert card.credit_limit == CreditCard.credit_limit == premium.credit_limit
+    assert card.withdraw(500) == True
+    account.transfer(20, card)
+    assert card.balance == -480
+    premium.add_annual_interest()
+    assert premium.balance == 105
+    assert bank.accrue_interest() == {premium.IBAN: pytest.approx(5.25)}
+    assert bank.accounts[account.IBAN] is account
+    assert isinstance(premium, (Savings, CreditCard, Premium)) and isinstance(card, CreditCard)
+    assert not isinstance(account, Savings)
+    assert bank.accounts_of_type(Savings) == [premium]
+    assert bank.accounts_of_type(CreditCard) == [card, premium]
+    assert bank.accrue_interest({Savings: 0.1, Account: 0.5}) == {premium.IBAN: pytest.approx(11.025)}
+    with pytest.raises(AttributeError):
+        account.nickname = 'Pete'
+
+
+def test_transaction_record():
+    """Test the compact Transaction record of a transaction row."""
+    bank = Bank('test_bank')
+    account = Account('Petra May', bank, 50)
+    record = account.transactions[0].to_record()
+    assert record.amount == 50
+    assert record.get('receiver') is account
+    assert record.get('unknown') is None
+    assert dict(account.transactions[0]) == record._asdict()
+
+
+def test_bank_transaction_commits_all_legs():
+    """Test that staged legs are committed together with one id."""
+    bank = Bank('test_bank')
+    account1 = Account('Petra May', bank, 100)
+    account2 = Account('Jim Gordon', bank)
+    with bank.transaction() as txn:
+        txn.transfer(account1, account2, 60)
+        txn.withdraw(account2, 50)
+        txn.deposit(account1, 5)
+    assert txn.executed == True
+    assert account1.balance == 45
+    assert account2.balance == 10
+    ids = {row['transaction_id'] for row in account1.transactions[1:]}
+    ids |= {row['transaction_id'] for row in account2.transactions}
+    assert len(ids) == 1
+
+
+def test_bank_transaction_all_or_nothing():
+    """Test that one uncovered leg rejects the whole transaction."""
+    bank = Bank('test_bank')
+    account1 = Account('Petra May', bank, 100)
+    account2 = Account('Jim Gordon', bank)
+    with bank.transaction() as txn:
+        txn.transfer(account1, account2, 60)
+        txn.withdraw(account2, 70)
+    assert txn.executed == False
+    assert account1.balance == 100
+    assert account2.balance == 0
+    assert account1.transactions[-1].get('executed') == False
+    assert all(account.verify_balance() for account in (account1, account2))
+
+
+def test_bank_transaction_discarded_on_error():
+    """Test that nothing is posted if the block raises."""
+    bank = Bank('test_bank')
+    account1 = Account('Petra May', bank, 100)
+    account2 = Account('Jim Gordon', bank)
+    with pytest.raises(ValueError):
+        with bank.transaction() as txn:
+            txn.transfer(account1, account2, 60)
+            raise ValueError('abort')
+    assert txn.executed is None
+    assert len(account1.transactions) == 1
+    assert len(account2.transactions) == 0
+
+
+def test_card_authorize_capture_release():
+    """Test holds on a CreditCard: authorize, partial capture and release."""
+    bank = Bank('test_bank')
+    card = CreditCard('Petra May', bank, 100)
+    shop = Account('Jim Gordon', bank)
+    assert card.available == 1100
+    hold = card.authorize(800, shop)
+    assert card.held == 800 and card.available == 300
+    assert card.authorize(400) is None
+    assert card.withdraw(400) == False
+    card.capture(hold, 750)
+    assert card.held == 0
+    assert card.balance == -650 and shop.balance == 750
+    assert card.transactions[-1].get('transaction_id') == hold
+    hold = card.authorize(300)
+    card.release(hold)
+    assert card.available == 350
+    with pytest.raises(AssertionError):
+        card.capture(hold)
+    assert card.verify_balance() and shop.verify_balance()
+
+
+def test_slotted_card_holds():
+    """Test that holds work on slotted accounts."""
+    bank = Bank('test_bank')
+    card = SlottedCreditCard('Petra May', bank)
+    hold = card.authorize(1000)
+    with pytest.raises(AssertionError):
+        card.capture(hold, 1001)
+    card.capture(hold)
+    assert card.balance == -1000 and card.available == 0
+
+
+def test_accounts_for_customer_and_type():
+    """Test the secondary indexes by customer and by account class."""
+    bank = Bank('test_bank')
+    savings = Savings('Petra May', bank)
+    premium = Premium('Petra May', bank)
+    card = CreditCard('Jim Gordon', bank)
+    account = Account('Jim Gordon', bank)
+    assert bank.accounts_for('Petra May') == [savings, premium]
+    assert bank.accounts_for('Nobody') == []
+    assert bank.accounts_of_type(Savings) == [savings, premium]
+    assert bank.accounts_of_type(CreditCard) == [premium, card]
+    assert len(bank.accounts_of_type(Account)) == 4
+    assert bank.accounts_of_type(SlottedAccount) == []
+
+
+def test_open_accounts_hands_ibans_to_its_own_accounts():
+    """Test that a failing constructor leaves no IBAN for unrelated accounts."""
+
+    class Picky(Account):
+        def __init__(self, customer, bank, init_balance=0, _iban=None):
+            assert customer != 'Nobody', 'No account for Nobody'
+            super().__init__(customer, bank, init_balance, _iban)
+
+    bank = Bank('test_bank')
+    with pytest.raises(AssertionError):
+        bank.open_accounts(['Petra May', 'Nobody', 'Jim Gordon'], [10, 20, 30], Picky)
+    account = Account('Tina Test', bank, 5)
+    assert len(bank.accounts) == 2
+    assert account.balance == 5
+    assert all(iban == acc.IBAN for iban, acc in bank.accounts.items())
+    assert sum(acc.balance for acc in bank.accounts.values()) == 5
@@ -0,0 +1,21 @@
+import json
+
+from ch3_scripts import benchmarks
+
+
+def test_benchmarks_run(tmp_path):
+    """Test a tiny run of all benchmarks and the JSON output."""
+    output = tmp_path / 'results.json'
+    assert benchmarks.main(['--scales', '50', '--repeat', '1', '--output', str(output)]) == 0
+    results = json.loads(output.read_text())['results']
+    assert set(results) == {'{}@50'.format(name) for name in benchmarks.BENCHMARKS}
+
+
+def test_benchmarks_regression_gate(tmp_path):
+    """Test that a run fails against a much faster baseline."""
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'results': {'deposit@50': {'seconds_per_op': 1e-12, 'n': 50}}}))
+    assert benchmarks.main(['--only', 'deposit', '--scales', '50', '--repeat', '1',
+                            '--baseline', str(baseline)]) == 1
+    assert benchmarks.compare({'deposit@50': {'seconds_per_op': 1.0}},
+                              {'deposit@50': {'seconds_per_op': 1.0}}) == []
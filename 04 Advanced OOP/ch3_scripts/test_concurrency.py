@@ -0,0 +1,117 @@
+import asyncio
+import random
+import sys
+import threading
+
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account, CreditCard
+
+
+@pytest.fixture
+def concurrent_bank():
+    """Pytest fixture for a bank in concurrency mode with a few accounts."""
+    bank = Bank('test_bank').enable_concurrency(stripes=8)
+    accounts = bank.open_accounts(['Customer {}'.format(i) for i in range(6)], [100] * 6)
+    return bank, accounts
+
+
+def test_threaded_transfers_lose_no_updates(concurrent_bank):
+    """Test that concurrent transfers keep the total and never overdraw."""
+    bank, accounts = concurrent_bank
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(2000):
+            sender, receiver = rng.sample(accounts, 2)
+            sender.transfer(rng.randint(1, 60), receiver)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(account.balance for account in accounts) == 600
+    assert all(account.balance >= 0 for account in accounts)
+    assert all(account.verify_balance() for account in accounts)
+
+
+def test_transfers_into_another_bank_hold_its_locks():
+    """Test that transfers from another bank and local deposits do not race."""
+    bank_a = Bank('bank a').enable_concurrency(stripes=8)
+    bank_b = Bank('bank b').enable_concurrency(stripes=8)
+    source = Account('Tina Test', bank_a, 10 ** 6)
+    target = Account('Tareq Test', bank_b)
+
+    def transfers():
+        for _ in range(5000):
+            source.transfer(1, target)
+
+    def deposits():
+        for _ in range(5000):
+            target.deposit(1)
+
+    threads = [threading.Thread(target=work) for work in (transfers, deposits) * 2]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    log = target.transactions
+    party = log.parties.lookup(source)
+    assert target.balance == len(log) == 20000
+    assert all(log._senders[pos] == party for pos in log._by_party[party])
+    assert target.verify_balance() and source.verify_balance()
+
+
+def test_transfer_async(concurrent_bank):
+    """Test concurrent coroutine transfers."""
+    bank, accounts = concurrent_bank
+
+    async def run():
+        await asyncio.gather(*[
+            accounts[i % 6].transfer_async(10, accounts[(i + 1) % 6])
+            for i in range(60)
+        ])
+
+    asyncio.run(run())
+    assert sum(account.balance for account in accounts) == 600
+    assert all(account.verify_balance() for account in accounts)
+
+
+def test_transfer_async_needs_concurrency():
+    """Test that transfer_async refuses banks without concurrency mode."""
+    bank = Bank('test_bank')
+    account1 = Account('Tina Test', bank, 100)
+    account2 = Account('Tareq Test', bank)
+    with pytest.raises(AssertionError):
+        asyncio.run(account1.transfer_async(10, account2))
+
+
+def test_concurrent_authorizations_never_exceed_funds():
+    """Test that racing authorizations and captures respect the credit limit."""
+    bank = Bank('test_bank').enable_concurrency(stripes=8)
+    card = CreditCard('Tina Test', bank)
+    shop = Account('Tareq Test', bank)
+
+    def worker():
+        for _ in range(200):
+            hold = card.authorize(7, shop)
+            if hold is not None:
+                card.capture(hold)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert card.held == 0
+    assert card.balance == -shop.balance
+    assert -1000 <= card.balance <= -994
+    assert card.verify_balance() and shop.verify_balance()
@@ -0,0 +1,53 @@
+import logging
+
+from ch3_scripts.bank_accounts import Bank, Account
+from ch3_scripts.events import Event, BufferedLogSink, CounterSink, RingBufferSink
+
+
+def test_silent_by_default(capsys):
+    """Test that postings print nothing when no sink is subscribed."""
+    bank = Bank('test_bank')
+    account = Account('Tina Tester', bank, 100)
+    account.withdraw(500)
+    assert capsys.readouterr().out == ''
+
+
+def test_ring_buffer_and_counter_sink():
+    """Test that subscribed sinks receive structured events."""
+    bank = Bank('test_bank')
+    ring = RingBufferSink(maxlen=2)
+    counter = CounterSink()
+    bank.subscribe(ring).subscribe(counter)
+    account = Account('Tina Tester', bank, 100)
+    account.withdraw(30)
+    account.withdraw(500)
+    assert list(ring.events) == [Event('withdraw', account.IBAN, -30, True),
+                                 Event('withdraw', account.IBAN, -500, False)]
+    assert counter.counts == {('deposit', True): 1,
+                              ('withdraw', True): 1,
+                              ('withdraw', False): 1}
+    bank.unsubscribe(counter)
+    account.deposit(5)
+    assert sum(counter.counts.values()) == 3
+
+
+def test_buffered_log_sink(caplog):
+    """Test that the log sink only writes on flush or when full, off the posting thread."""
+    bank = Bank('test_bank')
+    sink = BufferedLogSink(capacity=3)
+    bank.subscribe(sink)
+    with caplog.at_level(logging.INFO, logger='ch3_scripts.events'):
+        account = Account('Tina Tester', bank, 100)
+        account.withdraw(10)
+        assert caplog.records == []
+        sink.flush()
+        assert len(caplog.records) == 2
+        account.withdraw(10)
+        account.deposit(1)
+        account.withdraw(10)
+        sink._batches.join()
+        assert len(caplog.records) == 5
+        assert {record.threadName for record in caplog.records} == {'BufferedLogSink'}
+        account.deposit(1)
+        sink.close()
+        assert len(caplog.records) == 6
@@ -0,0 +1,47 @@
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account, Savings
+from ch3_scripts.iban import IBANAllocator, ACCOUNT_SPACE, is_valid_iban, make_iban
+
+
+def test_make_iban():
+    """Test checksum against a published example IBAN."""
+    assert make_iban(37040044, 532013000) == 'DE89370400440532013000'
+    assert is_valid_iban('DE89370400440532013000')
+    assert not is_valid_iban('DE88370400440532013000')
+
+
+def test_allocator_unique_and_valid():
+    """Test that allocated IBANs are unique, valid and deterministic per seed."""
+    allocator = IBANAllocator(12345678, seed=42)
+    ibans = allocator.allocate_many(20000)
+    assert len(set(ibans)) == 20000
+    assert all(is_valid_iban(iban) and len(iban) == 22 for iban in ibans)
+    assert IBANAllocator(12345678, seed=42, counter=100).allocate() == ibans[100]
+
+
+def test_allocator_stays_in_account_space():
+    """Test the cycle walking near the end of the account number space."""
+    allocator = IBANAllocator(12345678, seed=7)
+    numbers = [allocator.account_number(i) for i in range(ACCOUNT_SPACE - 1000, ACCOUNT_SPACE)]
+    assert all(0 <= number < ACCOUNT_SPACE for number in numbers)
+    assert len(set(numbers)) == 1000
+    with pytest.raises(AssertionError):
+        allocator.account_number(ACCOUNT_SPACE)
+
+
+def test_account_iban_valid():
+    """Test that new accounts get valid IBANs of their bank."""
+    bank = Bank('test_bank')
+    account = Account('Petra May', bank)
+    assert is_valid_iban(account.IBAN)
+    assert account.IBAN[4:12] == str(bank.bank_num)
+
+
+def test_open_accounts():
+    """Test opening accounts in bulk."""
+    bank = Bank('test_bank')
+    accounts = bank.open_accounts(['A', 'B', 'C'], [10, 0, 30], account_class=Savings)
+    assert [account.customer for account in accounts] == ['A', 'B', 'C']
+    assert [account.balance for account in accounts] == [10, 0, 30]
+    assert all(isinstance(account, Savings) for account in accounts)
+    assert len(bank.accounts) == 3
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account
+from ch3_scripts.ids import IdGenerator, format_id, id_timestamp
+
+
+def test_ids_unique_and_increasing():
+    """Test that ids increase strictly, even beyond 4096 per millisecond."""
+    generator = IdGenerator(node=5)
+    ids = [generator.next_id() for _ in range(20000)]
+    assert ids == sorted(set(ids))
+    assert all(transaction_id < 2 ** 63 for transaction_id in ids)
+
+
+def test_ids_differ_between_nodes():
+    """Test that generators with different nodes never collide."""
+    ids_a = {IdGenerator(node=1).next_id() for _ in range(1000)}
+    generator_b = IdGenerator(node=2)
+    assert ids_a.isdisjoint(generator_b.next_id() for _ in range(1000))
+    with pytest.raises(AssertionError):
+        IdGenerator(node=1024)
+
+
+def test_id_timestamp_and_format():
+    """Test decoding the time of an id and the export format."""
+    transaction_id = IdGenerator(node=0).next_id()
+    assert abs(id_timestamp(transaction_id) - time.time()) < 5
+    assert format_id(255) == '00000000000000ff'
+
+
+def test_account_transaction_ids():
+    """Test that postings carry integer ids sorted by time."""
+    bank = Bank('test_bank')
+    account1 = Account('Tina Tester', bank, 100)
+    account2 = Account('Tareq Tester', bank, 40)
+    account1.transfer(30, account2)
+    ids = [row['transaction_id'] for row in account1.transactions]
+    assert all(isinstance(transaction_id, int) for transaction_id in ids)
+    assert ids == sorted(ids)
+
+
+def test_banks_use_different_nodes():
+    """Test that banks of one process never hand out the same id."""
+    bank1 = Bank('bank 1')
+    bank2 = Bank('bank 2')
+    assert bank1._ids.node != bank2._ids.node
+    ids = {bank1._ids.next_id() for _ in range(1000)}
+    assert ids.isdisjoint(bank2._ids.next_id() for _ in range(1000))
+    assert Bank('bank 3', node=7)._ids.node == 7
@@ -0,0 +1,124 @@
+import csv
+import os
+import threading
+
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account, CreditCard
+from ch3_scripts.journal import Journal
+
+
+@pytest.fixture
+def journaled_bank(tmp_path):
+    """Pytest fixture for a bank with a journal and some postings."""
+    bank = Bank('test_bank')
+    account1 = Account('Tina Test', bank, 100)
+    bank.open_journal(str(tmp_path), group_commit=2)
+    account2 = CreditCard('Tareq Test', bank, 40)
+    account1.transfer(30, account2)
+    account2.withdraw(500)
+    account2.withdraw(2000)
+    return bank, account1, account2
+
+
+def test_restore_balances(journaled_bank, tmp_path):
+    """Test that a restored bank has the same accounts and balances."""
+    bank, account1, account2 = journaled_bank
+    bank.commit()
+    restored = Bank.restore(str(tmp_path))
+    assert restored.bank_num == bank.bank_num
+    assert set(restored.accounts) == set(bank.accounts)
+    assert restored.accounts[account1.IBAN].balance == 70
+    assert restored.accounts[account2.IBAN].balance == -430
+    assert isinstance(restored.accounts[account2.IBAN], CreditCard)
+    assert restored.accounts[account2.IBAN].verify_balance()
+
+
+def test_restore_after_checkpoint(journaled_bank, tmp_path):
+    """Test that postings after a checkpoint are replayed on top of it."""
+    bank, account1, account2 = journaled_bank
+    bank.checkpoint()
+    account1.deposit(5)
+    bank.commit()
+    restored = Bank.restore(str(tmp_path))
+    assert restored.accounts[account1.IBAN].balance == 75
+    # the restored bank keeps journaling
+    restored.accounts[account1.IBAN].withdraw(75)
+    restored.commit()
+    assert Bank.restore(str(tmp_path)).accounts[account1.IBAN].balance == 0
+
+
+def test_journal_grows(tmp_path):
+    """Test that the mapped file grows beyond its first chunk."""
+    journal = Journal(str(tmp_path), chunk_records=2)
+    for i in range(5):
+        journal.append(1, 1, i, 0, 0, -1.0, 0.0)
+    journal.close()
+    assert Journal(str(tmp_path)).count == 5
+
+
+def test_export_journal_statement(journaled_bank, tmp_path):
+    """Test CSV statements built from the journal."""
+    bank, account1, account2 = journaled_bank
+    bank.commit()
+    out = tmp_path / 'statements'
+    out.mkdir()
+    path = bank.export_journal_statement(account2.IBAN, str(out))
+    assert os.path.basename(path) == '{}.csv'.format(account2.IBAN)
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [float(row['amount']) for row in rows] == [40, 30, -500, -2000]
+    assert [row['executed'] for row in rows] == ['True', 'True', 'True', 'False']
+    assert rows[1]['sender'] == account1.IBAN
+
+
+def test_restore_keeps_empty_accounts_and_ibans(tmp_path):
+    """Test that accounts without postings survive and IBANs stay unique."""
+    bank = Bank('test_bank')
+    bank.open_journal(str(tmp_path))
+    empty = Account('Tommy Test', bank)
+    bank.commit()
+    restored = Bank.restore(str(tmp_path))
+    assert empty.IBAN in restored.accounts
+    new = Account('Tanja Test', restored)
+    assert new.IBAN not in bank.accounts
+
+
+def test_restore_multi_leg_transaction(tmp_path):
+    """Test that multi-leg transactions are journaled once per leg and replayed."""
+    bank = Bank('test_bank')
+    bank.open_journal(str(tmp_path))
+    account1 = Account('Tina Test', bank, 100)
+    account2 = Account('Tareq Test', bank)
+    count = bank._journal.count
+    with bank.transaction() as txn:
+        txn.transfer(account1, account2, 60)
+        txn.transfer(account2, account1, 10)
+    assert bank._journal.count == count + 2
+    bank.commit()
+    restored = Bank.restore(str(tmp_path))
+    assert restored.accounts[account1.IBAN].balance == 50
+    assert restored.accounts[account2.IBAN].balance == 50
+
+
+def test_checkpoint_during_concurrent_postings(tmp_path):
+    """Test that checkpoints taken while threads post restore every posting."""
+    bank = Bank('test_bank').enable_concurrency(stripes=4)
+    accounts = bank.open_accounts(['Customer {}'.format(i) for i in range(4)], [100] * 4)
+    bank.open_journal(str(tmp_path), group_commit=64)
+
+    def worker(seed):
+        for i in range(500):
+            accounts[(seed + i) % 4].transfer(1, accounts[(seed + i + 1) % 4])
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        bank.checkpoint()
+    for thread in threads:
+        thread.join()
+    bank.commit()
+
+    restored = Bank.restore(str(tmp_path))
+    for account in accounts:
+        assert restored.accounts[account.IBAN].balance == account.balance
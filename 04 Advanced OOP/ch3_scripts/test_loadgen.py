@@ -0,0 +1,36 @@
+import json
+import pstats
+
+from ch3_scripts import loadgen
+
+
+def test_generate_is_reproducible():
+    """Test that a seed gives the same workload and the mix is respected."""
+    workload = loadgen.generate(50, 500, {'deposit': 1, 'balance': 1}, skew=1.2, seed=3)
+    assert workload == loadgen.generate(50, 500, {'deposit': 1, 'balance': 1}, skew=1.2, seed=3)
+    assert {op for op, *_ in workload['operations']} == {'deposit', 'balance'}
+    assert all(account != counterparty for _, account, counterparty, _ in workload['operations'])
+
+
+def test_percentile():
+    """Test nearest rank percentiles."""
+    values = list(range(1, 101))
+    assert loadgen.percentile(values, 50) == 50
+    assert loadgen.percentile(values, 99) == 99
+    assert loadgen.percentile([], 50) is None
+
+
+def test_loadgen_cli(tmp_path):
+    """Test a small run with saved workload, profile and JSON report."""
+    workload = tmp_path / 'workload.json'
+    profile = tmp_path / 'loadgen.prof'
+    output = tmp_path / 'report.json'
+    assert loadgen.main(['--accounts', '20', '--operations', '400', '--save', str(workload)]) == 0
+    assert loadgen.main(['--workload', str(workload), '--rate', '20000',
+                         '--account-class', 'SlottedPremium',
+                         '--profile', str(profile), '--output', str(output)]) == 0
+    summary = json.loads(output.read_text())['operations']
+    assert set(summary) == set(loadgen.OPERATIONS)
+    assert sum(stats['count'] for stats in summary.values()) == 400
+    assert all(stats['p50_us'] <= stats['p99_us'] for stats in summary.values())
+    assert pstats.Stats(str(profile)).total_calls > 0
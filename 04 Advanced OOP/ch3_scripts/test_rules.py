@@ -0,0 +1,70 @@
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account
+from ch3_scripts.rules import SlidingWindow, VelocityRule
+
+
+def test_sliding_window_expires_buckets():
+    """Test that postings leave the window after its length."""
+    window = SlidingWindow(60, buckets=6)
+    window.add(10, 0).add(20, 25).add(5, 59)
+    assert (window.count, window.total) == (3, 35)
+    window.advance(65)
+    assert (window.count, window.total) == (2, 25)
+    window.advance(85)
+    assert (window.count, window.total) == (1, 5)
+    window.advance(1000)
+    assert (window.count, window.total) == (0, 0)
+
+
+def test_velocity_count_rule():
+    """Test a limit on the number of withdrawals and transfers."""
+    bank = Bank('test_bank')
+    rule = VelocityRule('withdrawals', 600, max_count=3)
+    bank.add_rule(rule)
+    account1 = Account('Tina Test', bank, 1000)
+    account2 = Account('Tareq Test', bank)
+    assert account1.withdraw(10)
+    account1.transfer(10, account2)
+    account1.deposit(5)
+    assert account1.withdraw(10)
+    assert not account1.withdraw(10)
+    account1.transfer(10, account2)
+    assert account1.transactions[-1].get('executed') == False
+    assert account2.balance == 10
+    assert account1.balance == 975
+    assert rule.rejected == 2
+    assert account2.withdraw(10)
+    assert account1.verify_balance()
+
+
+def test_velocity_amount_rule_in_batches():
+    """Test a limit on the amount, including legs of the same batch."""
+    bank = Bank('test_bank')
+    bank.add_rule(VelocityRule('daily amount', 86400, max_amount=100))
+    account1, account2 = bank.open_accounts(['Tina Test', 'Tareq Test'], [1000, 0])
+    assert bank.post_batch([(account1.IBAN, account2.IBAN, 60),
+                            (account1.IBAN, 'CASH', 50),
+                            (account1.IBAN, 'CASH', 40)]) == [True, False, True]
+    assert account1.authorize(1) is None
+    assert account1.balance == 900
+    bank.remove_rule(bank._rules[0])
+    assert account1.withdraw(500)
+
+
+def test_velocity_rule_counts_holds_at_authorization():
+    """Test that authorized holds count against the rules once."""
+    bank = Bank('test_bank')
+    bank.add_rule(VelocityRule('card', 86400, max_count=2, max_amount=100))
+    account1, account2 = bank.open_accounts(['Tina Test', 'Tareq Test'], [1000, 0])
+    holds = [account1.authorize(40, account2) for _ in range(3)]
+    assert holds[2] is None
+    for hold in holds[:2]:
+        account1.capture(hold)
+    assert account2.balance == 80
+    assert not account1.withdraw(1)
+
+
+def test_velocity_rule_needs_a_limit():
+    """Test that a rule without limits is refused."""
+    with pytest.raises(AssertionError):
+        VelocityRule('nothing', 60)
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account, CreditCard
+from ch3_scripts.sharding import ShardedBank, shard_of, _post, _credit, _refund
+
+
+@pytest.fixture
+def sharded_bank():
+    """Pytest fixture for a bank with 3 shards and 8 accounts of 100 each."""
+    with ShardedBank('test_bank', shards=3) as bank:
+        ibans = bank.open_accounts(['Customer {}'.format(i) for i in range(8)], [100] * 8)
+        yield bank, ibans
+
+
+def test_sharded_transfers(sharded_bank):
+    """Test transfers within and across shards."""
+    bank, ibans = sharded_bank
+    local = [(a, b) for a in ibans for b in ibans
+             if a != b and shard_of(a, 3) == shard_of(b, 3)]
+    crossing = [(a, b) for a in ibans for b in ibans if shard_of(a, 3) != shard_of(b, 3)]
+    sender, receiver = crossing[0]
+    assert bank.transfer(sender, receiver, 60)
+    assert not bank.transfer(sender, receiver, 60)
+    assert bank.balances([sender, receiver]) == {sender: 40, receiver: 160}
+    if local:
+        sender, receiver = local[0]
+        assert bank.post_batch([(sender, receiver, 10), ('CASH', sender, 5),
+                                (receiver, 'CASH', 1000)]) == [True, True, False]
+    balances = bank.balances()
+    assert len(balances) == len(bank) == 8
+    assert sum(balances.values()) == 800 + 5 * bool(local)
+    assert bank.verify_balances()
+
+
+def test_sharded_random_batch_keeps_total(sharded_bank):
+    """Test that a random batch across shards never overdraws or loses money."""
+    bank, ibans = sharded_bank
+    rng = random.Random(1)
+    records = [tuple(rng.sample(ibans, 2)) + (rng.randint(1, 80),) for _ in range(500)]
+    mask = bank.post_batch(records)
+    assert any(mask) and not all(mask)
+    balances = bank.balances()
+    assert sum(balances.values()) == 800
+    assert all(balance >= 0 for balance in balances.values())
+
+
+def test_sharded_bank_checks(sharded_bank):
+    """Test unknown IBANs and account classes on shards."""
+    bank, ibans = sharded_bank
+    with pytest.raises(AssertionError):
+        bank.transfer(ibans[0], 'DE00', 1)
+    (card,) = bank.open_accounts(['Tina Test'], account_class=CreditCard)
+    assert bank.transfer(card, ibans[0], 500)
+    assert bank.balances([card]) == {card: -500}
+
+
+def test_cross_shard_legs_share_the_transaction_id():
+    """Test that debit, credit and refund of a cross-shard transfer use one id."""
+    bank_a, bank_b = Bank('shard a'), Bank('shard b')
+    sender = Account('Petra May', bank_a, 100)
+    receiver = Account('Selina Kyle', bank_b)
+    mask, debits, error = _post(bank_a, [(sender.IBAN, receiver.IBAN, 30),
+                                         (sender.IBAN, receiver.IBAN, 500)])
+    assert mask == [True, False] and debits[1] is None and error is None
+    _credit(bank_b, [(debits[0], sender.IBAN, receiver.IBAN, 30)])
+    assert sender.transactions[1]['transaction_id'] == debits[0]
+    assert receiver.transactions[0]['transaction_id'] == debits[0]
+    _refund(bank_a, [(debits[0], sender.IBAN, receiver.IBAN, 30)])
+    assert sender.transactions[-1]['transaction_id'] == debits[0]
+    assert sender.balance == 100 and sender.verify_balance()
+
+
+def test_failed_shard_refunds_cross_shard_debits(sharded_bank):
+    """Test that a shard failing in phase one does not lose the debited amounts."""
+    bank, ibans = sharded_bank
+    sender, receiver = next((a, b) for a in ibans for b in ibans if shard_of(a, 3) != shard_of(b, 3))
+    with pytest.raises(AssertionError):
+        bank.post_batch([(sender, receiver, 60), ('CASH', receiver, 'not an amount')])
+    assert bank.balances([sender, receiver]) == {sender: 100, receiver: 100}
+    # the failing record is on the sender's shard, after the debit
+    with pytest.raises(AssertionError):
+        bank.post_batch([(sender, receiver, 60), ('CASH', sender, 'not an amount')])
+    assert bank.balances([sender, receiver]) == {sender: 100, receiver: 100}
+    assert sum(bank.balances().values()) == 800
+    assert bank.verify_balances()
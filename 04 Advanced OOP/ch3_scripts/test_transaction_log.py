@@ -0,0 +1,129 @@
+import datetime
+import time
+from decimal import Decimal
+
+import pytest
+from ch3_scripts.bank_accounts import Bank, Account
+from ch3_scripts.transaction_log import CHECKPOINT_INTERVAL, PartyTable, TransactionLog
+
+
+@pytest.fixture
+def log():
+    """Pytest fixture for a TransactionLog with rows in two months."""
+    out = TransactionLog(PartyTable())
+    jan = datetime.datetime(2024, 1, 15).timestamp()
+    feb = datetime.datetime(2024, 2, 3).timestamp()
+    out.append(1, 100, 'CASH', 'Tina', True, jan)
+    out.append(2, -30, 'Tina', 'Tareq', True, jan + 60)
+    out.append(3, -500, 'Tina', 'CASH', False, feb)
+    out.append(4, 20, 'Tareq', 'Tina', True, feb + 60)
+    return out
+
+
+def test_row_view_is_dict_compatible(log):
+    """Test that rows behave like the former transaction dicts."""
+    row = log[-1]
+    assert row.get('amount') == 20
+    assert row.get('sender') == 'Tareq'
+    assert row['executed'] == True
+    assert row.get('unknown') is None
+    assert set(row.keys()) == {'transaction_id', 'amount', 'sender',
+                               'receiver', 'executed', 'timestamp'}
+    with pytest.raises(IndexError):
+        log[4]
+
+
+def test_log_reductions(log):
+    """Test balance, pending and counterparty filtering."""
+    assert log.balance() == 90
+    assert log.pending() == -500
+    assert [row['amount'] for row in log.for_counterparty('Tareq')] == [-30, 20]
+    assert log.for_counterparty('Nobody') == []
+
+
+def test_monthly_totals(log):
+    """Test totals per calendar month."""
+    assert log.monthly_totals() == {(2024, 1): 70, (2024, 2): 20}
+    assert log.monthly_totals(executed=False) == {(2024, 2): -500}
+
+
+def test_account_uses_log():
+    """Test that accounts store transactions in a TransactionLog."""
+    bank = Bank('test_bank')
+    account = Account('Petra May', bank, 50)
+    account.withdraw(20)
+    assert isinstance(account.transactions, TransactionLog)
+    assert account.transactions[0].get('receiver') == account
+    assert account.transactions.balance() == account.balance == 30
+
+
+def test_append_checks_before_appending():
+    """Test that rejected amounts leave all columns the same length."""
+    bank = Bank('test_bank')
+    account = Account('Tina Test', bank, 100)
+    for amount in ('5', Decimal('0.2')):
+        with pytest.raises(AssertionError):
+            account.deposit(amount)
+    account.deposit(0.5)
+    log = account.transactions
+    assert len(log._ids) == len(log._amounts) == len(log._timestamps) == len(log) == 2
+    assert log[1]['transaction_id'] == log._ids[1]
+    assert account.balance == 100.5 and account.verify_balance()
+
+
+def test_query(log):
+    """Test indexed queries by counterparty, time range and executed status."""
+    feb = datetime.datetime(2024, 2, 1)
+    assert [row['amount'] for row in log.query(counterparty='Tareq')] == [-30, 20]
+    assert [row['amount'] for row in log.query(counterparty='CASH')] == [100, -500]
+    assert [row['amount'] for row in log.query(counterparty='CASH', executed=True)] == [100]
+    assert [row['amount'] for row in log.query(executed=False)] == [-500]
+    assert [row['amount'] for row in log.query(since=feb)] == [-500, 20]
+    assert [row['amount'] for row in log.query(until=feb)] == [100, -30]
+    assert [row['amount'] for row in log.query(counterparty='Tareq', since=feb)] == [20]
+    assert log.query(counterparty='Nobody') == []
+
+
+def test_account_query():
+    """Test Account.query with the owner left out of the counterparty index."""
+    bank = Bank('test_bank')
+    account1 = Account('Tina Tester', bank, 100)
+    account2 = Account('Tareq Tester', bank, 40)
+    account1.transfer(30, account2)
+    account1.withdraw(500)
+    assert [row['amount'] for row in account1.query(counterparty=account2)] == [-30]
+    assert [row['amount'] for row in account1.query(executed=False)] == [-500]
+    assert len(account1.query(counterparty=account1)) == 3
+
+
+def test_balance_at(log):
+    """Test point-in-time balances within the first checkpoint interval."""
+    jan = datetime.datetime(2024, 1, 15)
+    assert log.balance_at(jan.timestamp() - 1) == 0
+    assert log.balance_at(jan) == 100
+    assert log.balance_at(datetime.datetime(2024, 2, 1)) == 70
+    assert log.balance_at(datetime.datetime(2024, 3, 1)) == 90
+
+
+def test_balance_at_across_checkpoints():
+    """Test balance_at against a full replay over many checkpoints."""
+    log = TransactionLog(PartyTable())
+    log.opening_balance = 5
+    for i in range(CHECKPOINT_INTERVAL * 3 + 10):
+        log.append(i, i % 7 - 2, 'CASH', 'Tina', i % 5 != 0, float(i))
+    for t in (0, CHECKPOINT_INTERVAL - 1, CHECKPOINT_INTERVAL, 600, 10 ** 6):
+        expected = 5 + sum(i % 7 - 2 for i in range(min(t + 1, len(log))) if i % 5 != 0)
+        assert log.balance_at(t) == expected
+    assert log.balance_at(10 ** 6) == log.balance()
+
+
+def test_bank_balances_at():
+    """Test balances of all accounts of a bank at a point in time."""
+    bank = Bank('test_bank')
+    account1, account2 = bank.open_accounts(['Tina Test', 'Tareq Test'], [100, 50])
+    before = account2.transactions[-1]['timestamp']
+    time.sleep(0.01)
+    account1.transfer(30, account2)
+    assert list(bank.balances_at(before)) == [100, 50]
+    assert list(bank.balances_at(account2.transactions[-1]['timestamp'])) == [70, 80]
+    assert account2.balance_at(before - 1) == 0
@@ -0,0 +1,345 @@
+import datetime
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from collections.abc import Mapping
+from itertools import compress
+
+from .statements import party_label
+
+
+# Rows between two balance checkpoints of a TransactionLog.
+CHECKPOINT_INTERVAL = 256
+
+
+class PartyTable():
+    """Interning table for the parties of a transaction.
+
+    Every sender or receiver (an Account object or a label like 'CASH') gets
+    a small integer index, so transaction logs only store integers.
+
+    Attributes:
+        parties (list): Interned parties, the position is the party index.
+
+    """
+
+    def __init__(self):
+        self.parties = []
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def intern(self, party):
+        """Return the index of party, adding it to the table if it is new."""
+        index = self._index.get(party)
+        if index is None:
+            with self._lock:
+                index = self._index.get(party)
+                if index is None:
+                    index = len(self.parties)
+                    self.parties.append(party)
+                    self._index[party] = index
+        return index
+
+    def lookup(self, party):
+        """Return the index of party or None if it was never interned."""
+        return self._index.get(party)
+
+    def __len__(self):
+        return len(self.parties)
+
+    def __getitem__(self, index):
+        return self.parties[index]
+
+
+class Transaction(namedtuple('Transaction', ['transaction_id', 'amount', 'sender',
+                                             'receiver', 'executed', 'timestamp'])):
+    """Compact, immutable transaction record.
+
+    Has the keys of the former transaction dicts as attributes and supports
+    get() for code written against the dicts.
+
+    """
+
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return getattr(self, key)
+        return default
+
+
+class TransactionView(Mapping):
+    """Read-only, dict-compatible view on one row of a TransactionLog.
+
+    Supports the same keys as the former transaction dicts, so code like
+    `transactions[-1].get('amount')` keeps working.
+
+    """
+
+    __slots__ = ('_log', '_pos')
+
+    _keys = ('transaction_id', 'amount', 'sender', 'receiver', 'executed', 'timestamp')
+
+    def __init__(self, log, pos):
+        self._log = log
+        self._pos = pos
+
+    def __getitem__(self, key):
+        log = self._log
+        pos = self._pos
+        if key == 'amount':
+            return log._amounts[pos]
+        if key == 'executed':
+            return bool(log._executed[pos])
+        if key == 'sender':
+            return log.parties[log._senders[pos]]
+        if key == 'receiver':
+            return log.parties[log._receivers[pos]]
+        if key == 'transaction_id':
+            return log._ids[pos]
+        if key == 'timestamp':
+            return log._timestamps[pos]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(TransactionView._keys)
+
+    def __len__(self):
+        return len(TransactionView._keys)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def to_record(self):
+        """Return the row as Transaction record."""
+        return Transaction(*(self[key] for key in TransactionView._keys))
+
+
+class TransactionLog():
+    """Column store for the transactions of one account.
+
+    Each column is a typed array: amounts, executed flags, interned sender and
+    receiver indices, 64-bit transaction ids and timestamps. Timestamps never decrease, so the log is sorted by time.
+
+    Secondary indexes are maintained on append: the positions per
+    counterparty and the positions of all failed transactions. Every
+    CHECKPOINT_INTERVAL rows the executed total so far is stored as a
+    checkpoint for balance_at.
+
+    Args:
+        parties (PartyTable): Interning table shared within a bank.
+        owner: Optional. Account owning the log. It is part of every row, so
+            it is left out of the counterparty index.
+    Attributes:
+        opening_balance (float): Balance carried forward from before the
+            first row, e.g. when an account is restored from a journal.
+
+    """
+
+    __slots__ = ('parties', 'opening_balance', '_owner', '_by_party', '_failed',
+                 '_total', '_checkpoints', '_ids', '_amounts', '_executed', '_senders',
+                 '_receivers', '_timestamps')
+
+    def __init__(self, parties, owner=None):
+        self.parties = parties
+        self.opening_balance = 0
+        self._owner = None if owner is None else parties.intern(owner)
+        self._by_party = {}
+        self._failed = array('q')
+        self._total = 0
+        self._checkpoints = array('d')
+        self._ids = array('Q')
+        self._amounts = array('d')
+        self._executed = array('b')
+        self._senders = array('q')
+        self._receivers = array('q')
+        self._timestamps = array('d')
+
+    def append(self, transaction_id, amount, sender, receiver, executed, timestamp=None):
+        """Append a transaction.
+
+        Args:
+            transaction_id (int): 64-bit transaction id, see ch3_scripts.ids.
+            amount (int, float): Signed amount of the transaction, stored as float.
+            sender: Account-Object or label of the sender.
+            receiver: Account-Object or label of the receiver.
+            executed (bool): Whether the transaction was executed.
+            timestamp (float): Optional. Unix time, defaults to now.
+        Returns:
+            int: Position of the new row.
+        Raises:
+            AssertionError: If amount is not an int or float, e.g. a Decimal
+                that the float column would round, or transaction_id does
+                not fit 64 bits. Nothing is appended then.
+
+        """
+
+        # check everything before the first column grows
+        assert isinstance(amount, (int, float)), 'amount must be int or float'
+        assert 0 <= transaction_id < 1 << 64, 'transaction_id must fit 64 bits'
+        if timestamp is None:
+            timestamp = time.time()
+        if self._timestamps and timestamp < self._timestamps[-1]:
+            timestamp = self._timestamps[-1]
+        sender = self.parties.intern(sender)
+        receiver = self.parties.intern(receiver)
+        self._ids.append(transaction_id)
+        self._amounts.append(amount)
+        self._executed.append(1 if executed else 0)
+        self._senders.append(sender)
+        self._receivers.append(receiver)
+        self._timestamps.append(timestamp)
+        pos = len(self._amounts) - 1
+        for party in {sender, receiver}:
+            if party != self._owner:
+                positions = self._by_party.get(party)
+                if positions is None:
+                    positions = self._by_party[party] = array('q')
+                positions.append(pos)
+        if executed:
+            self._total += amount
+        else:
+            self._failed.append(pos)
+        if (pos + 1) % CHECKPOINT_INTERVAL == 0:
+            self._checkpoints.append(self._total)
+        return pos
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [TransactionView(self, i) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError('transaction index out of range')
+        return TransactionView(self, pos)
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield TransactionView(self, pos)
+
+    def __repr__(self):
+        return 'TransactionLog({} transactions)'.format(len(self))
+
+    def columns(self):
+        """Return the column arrays, in the order of statements.HEADER."""
+        return (self._ids, self._amounts, self._senders,
+                self._receivers, self._executed, self._timestamps)
+
+    def labels(self):
+        """Return {party index: label} for all parties used in this log."""
+        parties = self.parties
+        return {index: party_label(parties[index])
+                for index in set(self._senders).union(self._receivers)}
+
+    def balance(self):
+        """Opening balance plus the sum of all executed amounts."""
+        return self.opening_balance + sum(compress(self._amounts, self._executed))
+
+    def balance_at(self, timestamp):
+        """Balance including all rows with a timestamp <= timestamp.
+
+        Finds the row by bisection, starts from the checkpoint before it and
+        sums at most CHECKPOINT_INTERVAL executed amounts.
+
+        Args:
+            timestamp (float, datetime.datetime): Point in time.
+        Returns:
+            float: The balance at that time. Rows carried as opening balance
+                count as before every timestamp.
+
+        """
+
+        if isinstance(timestamp, datetime.datetime):
+            timestamp = timestamp.timestamp()
+        pos = bisect_right(self._timestamps, timestamp)
+        checkpoint = pos // CHECKPOINT_INTERVAL
+        start = checkpoint * CHECKPOINT_INTERVAL
+        total = self._checkpoints[checkpoint - 1] if checkpoint else 0
+        return self.opening_balance + total + sum(
+            compress(self._amounts[start:pos], self._executed[start:pos]))
+
+    def pending(self):
+        """Sum of all amounts that were not executed."""
+        return sum(compress(self._amounts, [not flag for flag in self._executed]))
+
+    def for_counterparty(self, party):
+        """Return all transactions sent to or received from party."""
+        return self.query(counterparty=party)
+
+    def query(self, counterparty=None, since=None, until=None, executed=None):
+        """Return the transactions matching all given conditions.
+
+        The smallest index that applies is used as candidate set: the
+        positions of the counterparty, the failed positions or the time range
+        found by bisection on the timestamps.
+
+        Args:
+            counterparty: Optional. Account-Object or label of the other party.
+            since (float, datetime.datetime): Optional. Earliest timestamp, inclusive.
+            until (float, datetime.datetime): Optional. Latest timestamp, exclusive.
+            executed (bool): Optional. Only executed (True) or failed (False) transactions.
+        Returns:
+            list: Matching rows as TransactionView, oldest first.
+
+        """
+
+        if isinstance(since, datetime.datetime):
+            since = since.timestamp()
+        if isinstance(until, datetime.datetime):
+            until = until.timestamp()
+        lo = 0 if since is None else bisect_left(self._timestamps, since)
+        hi = len(self) if until is None else bisect_left(self._timestamps, until)
+
+        if counterparty is not None or executed is False:
+            if counterparty is not None:
+                index = self.parties.lookup(counterparty)
+                if index == self._owner and index is not None:
+                    positions = range(len(self))
+                else:
+                    positions = self._by_party.get(index, ())
+            else:
+                positions = self._failed
+            positions = positions[bisect_left(positions, lo):bisect_left(positions, hi)]
+        else:
+            positions = range(lo, hi)
+
+        if executed is not None:
+            flags = self._executed
+            positions = [pos for pos in positions if bool(flags[pos]) == executed]
+        return [TransactionView(self, pos) for pos in positions]
+
+    def monthly_totals(self, executed=True):
+        """Sum of amounts per calendar month.
+
+        Since the log is sorted by timestamp, every month is a contiguous
+        slice that is found by bisection and summed in one pass.
+
+        Args:
+            executed (bool): Optional. Sum executed (True) or failed (False)
+                transactions. Defaults to True.
+        Returns:
+            dict: {(year, month): total}
+
+        """
+
+        totals = {}
+        if not self._timestamps:
+            return totals
+        flags = self._executed if executed else [not flag for flag in self._executed]
+        first = datetime.datetime.fromtimestamp(self._timestamps[0])
+        year, month = first.year, first.month
+        start = 0
+        while start < len(self):
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            boundary = datetime.datetime(year, month, 1).timestamp()
+            stop = bisect_left(self._timestamps, boundary, start)
+            if any(flags[start:stop]):
+                key = (year - 1, 12) if month == 1 else (year, month - 1)
+                totals[key] = sum(compress(self._amounts[start:stop], flags[start:stop]))
+            start = stop
+        return totals
@@ -0,0 +1,77 @@
+import datetime
+from contextlib import contextmanager
+
+
+class Clock():
+    """
+    Source of the current date for products, stores and customers.
+
+    Within a frozen() block every call to today() returns the same date,
+    so one request reads the date once instead of once per product.
+
+    """
+
+    def __init__(self):
+        self._frozen = None
+        self._depth = 0
+
+    def _now(self):
+        raise NotImplementedError
+
+    def today(self):
+        """datetime.date: Current date, or the frozen date within frozen()."""
+        if self._frozen is not None:
+            return self._frozen
+        return self._now()
+
+    @contextmanager
+    def frozen(self):
+        """Use one date for all calls to today() within the block. Blocks can be nested."""
+        if self._depth == 0:
+            self._frozen = self._now()
+        self._depth += 1
+        try:
+            yield self._frozen
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._frozen = None
+
+
+class SystemClock(Clock):
+    """Clock returning datetime.date.today()."""
+
+    def _now(self):
+        return datetime.date.today()
+
+
+class SimulatedClock(Clock):
+    """
+    Clock that only moves when advanced, for simulations and tests.
+
+    Args:
+        start (datetime.date): Optional. Start date. Defaults to today.
+
+    """
+
+    def __init__(self, start=None):
+        super().__init__()
+        self._today = start or datetime.date.today()
+
+    def _now(self):
+        return self._today
+
+    def advance(self, days=0, weeks=0):
+        """Move the clock forward by days and weeks."""
+        assert days >= 0 and weeks >= 0, 'Time can only move forward'
+        self._today += datetime.timedelta(days=days, weeks=weeks)
+        return self
+
+    def set(self, date):
+        """Move the clock to date."""
+        self._today = date
+        return self
+
+
+# Clock used by products and stores that are not given one.
+default_clock = SystemClock()
@@ -1,9 +1,14 @@
 import datetime
+import heapq
+from collections import namedtuple
 from store import RentalStore
 from products import Product, Laptop, Phone
 
 NoneType = type(None)
 
+# terms of one rental, recorded when renting
+Rental = namedtuple('Rental', ['product', 'rental_start', 'rental_time', 'price_per_week'])
+
 class Customer():
     """
     Serves as the main interface of the rental system. Stores information about customers
@@ -39,30 +44,94 @@ class Customer():
             assert isinstance(item, Product), 'Can only rent Product Objects'
         self.name = name
         self.store = store
-        self._rented_items = []
+        # rentals move from current to due to paid, keyed by
+        # (product_id, rental_start) so every rental is booked once
+        self._current = {}
+        self._due = {}
         self._paid = {}
+        self._invoice = 0
+        # rentals not yet keyed into _expiry, see _refresh
+        self._new = []
+        self._expiry = []
+        self._sequence = 0
         self._owned_items = [] # for purchased items
 
+    def _add_rental(self, item):
+        """Book a product that was just rented as current item."""
+        key = (item.product_id, item.rental_start)
+        self._current[key] = Rental(item, item.rental_start, item.rental_time, item.price_per_week)
+        self._new.append(key)
+
+    def _push(self, key, rental):
+        self._sequence += 1
+        rental_end = rental.rental_start + datetime.timedelta(weeks=rental.rental_time)
+        heapq.heappush(self._expiry, (rental_end, self._sequence, key))
+
+    def _update(self, key):
+        """Return the rental of key with the current terms of its product.
+
+        The product's rental_start and rental_time still belong to this
+        rental unless the product was rented again since, which starts
+        later. Then the rental keeps the terms recorded when renting.
+
+        """
+
+        rental = self._current[key]
+        item = rental.product
+        if item.rental_start <= rental.rental_start:
+            rental = self._current[key] = rental._replace(rental_start=item.rental_start,
+                                                          rental_time=item.rental_time)
+        return rental
+
+    def _refresh(self):
+        """Move current items whose rental has ended to the due items.
+
+        New rentals are keyed by their rental_end at the first query after
+        renting. Only the ended top of the expiry heap is looked at, rentals
+        extended meanwhile are pushed again with their new end. Rentals are
+        billed with their own terms, a later rental of the same product by
+        anyone does not change them.
+
+        """
+
+        for key in self._new:
+            if key in self._current:
+                self._push(key, self._update(key))
+        self._new = []
+        today = self.store.clock.today()
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= today:
+            _, _, key = heapq.heappop(expiry)
+            if key not in self._current:
+                continue
+            rental = self._update(key)
+            if rental.rental_start + datetime.timedelta(weeks=rental.rental_time) > today:
+                self._push(key, rental)
+                continue
+            del self._current[key]
+            self._due[key] = rental
+            self._invoice += rental.rental_time * rental.price_per_week
+
     @property
     def invoice(self):
         """float: Outstanding amount to pay by customer for due items."""
-        return sum([item.rental_time * item.price_per_week for item in self.due_items])
+        self._refresh()
+        return self._invoice
 
     @property
     def current_items(self):
-        return [item for item in self._rented_items if item.rental_end > datetime.date.today()]
+        self._refresh()
+        return [rental.product for rental in self._current.values()]
 
     @property
     def due_items(self):
-        return [item for item in self._rented_items
-                if item.rental_end <= datetime.date.today()
-                and not self._paid[item.product_id]]
+        self._refresh()
+        return [rental.product for rental in self._due.values()]
 
     @property
     def paid_items(self):
-        return [item for item in self._rented_items
-                if item.rental_end <= datetime.date.today()
-                and self._paid[item.product_id]]
+        self._refresh()
+        return [rental.product for rental in self._paid.values()]
 
     @property
     def owned_items(self):
@@ -80,9 +149,10 @@ class Customer():
         assert amount_paid > 0, 'amount_paid must be positive'
         assert self.invoice == amount_paid, 'Whole bill must be paid, no partial payments possible'
 
-        # delete old items
-        for item in self.due_items:
-            self._paid[item.product_id] = True
+        # move due items to paid items
+        self._paid.update(self._due)
+        self._due = {}
+        self._invoice = 0
 
     def rent(self, item_name, rental_time):
         """Rent item for specific amount of time.
@@ -97,15 +167,13 @@ class Customer():
         """
 
         #check if item in Store
-        assert item_name in [item.name for item in self.store.products], 'item must be in store'
-        #check if item available
-        rental_item = [item for item in self.store.products
-                      if item.name == item_name][0]
+        rental_item = self.store.find(item_name)
+        assert rental_item is not None, 'item must be in store'
         
         # if item available in store, set rental time and start rental today
         if rental_item.rent(rental_time):
-            self._rented_items.append(rental_item)
-            self._paid[rental_item.product_id] = False
+            self.store.mark_rented(rental_item)
+            self._add_rental(rental_item)
             
         # if not available, display message and all store items
         else:
@@ -125,13 +193,12 @@ class Customer():
         """
 
         #check if item in Store
-        assert item_name in [item.name for item in self.store.products], 'item must be in store'
+        purchased_item = self.store.find(item_name)
+        assert purchased_item is not None, 'item must be in store'
         #check if item available
-        purchased_item = [item for item in self.store.products
-                          if item.name == item_name][0]
         if purchased_item.available and purchased_item.buyable:
             # delete from rental store
-            self.store.products.remove(purchased_item)
+            self.store.remove(purchased_item)
             self._owned_items.append(purchased_item)
         else:
             print('Sorry, {} is currently not available for purchase'.format(item_name))
@@ -156,8 +223,9 @@ Rented items: {}
 Due items: {}
 Amount payable: {}"""
 
-        return base_str.format(self.name,
-                               self.owned_items,
-                               self.current_items,
-                               self.due_items,
-                               self.invoice)
\ No newline at end of file
+        with self.store.clock.frozen():
+            return base_str.format(self.name,
+                                   self.owned_items,
+                                   self.current_items,
+                                   self.due_items,
+                                   self.invoice)
\ No newline at end of file
@@ -1,6 +1,8 @@
 import datetime
 import uuid
 
+from clock import default_clock
+
 NoneType = type(None)
 
 class Product():
@@ -16,9 +18,13 @@ class Product():
         name (str): Product's name.
         product_id (str): Unique product ID given by uuid.uuid1().
         buyable (bool): Product's status regarding purchases. Defaults to False.
+        clock (Clock): Source of the current date. Defaults to the system date,
+            a RentalStore sets its own clock on its products.
     
     """
 
+    clock = default_clock
+
     def __init__(self, 
                  name,
                  price_per_week=0):
@@ -61,7 +67,7 @@ class Product():
         assert rental_time > 0, 'rental_time must be positive'
         if self.available:
             self._rental_time = rental_time
-            self._rental_start = datetime.date.today()
+            self._rental_start = self.clock.today()
             return True
         else:
             return False
@@ -93,7 +99,7 @@ class Product():
         """bool: Product's availability."""
         if isinstance(self._rental_time, NoneType):
             return True
-        elif datetime.date.today() > self.rental_end:
+        elif self.clock.today() > self.rental_end:
             return True
         else:
             return False
@@ -148,7 +154,7 @@ class Laptop(Product):
         assert rental_time <= Laptop.max_rental_time, 'Rental time must be below {} weeks'.format(Laptop.max_rental_time)
         if self.available:
             self._rental_time = rental_time
-            self._rental_start = datetime.date.today()
+            self._rental_start = self.clock.today()
             return True
         else:
             return False
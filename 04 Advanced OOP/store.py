@@ -1,25 +1,285 @@
+import heapq
+from collections import namedtuple
+from collections.abc import Sequence
+from itertools import islice
 
+from clock import default_clock
 from products import Product, Laptop, Phone
 
 NoneType = type(None) 
 
+
+# Outcome of RentalStore.rent_many. failures holds (item, rental_time, reason) tuples.
+RentalResult = namedtuple('RentalResult', ['rented', 'failures'])
+
+
+class ProductList(Sequence):
+    """Read-only list view on the products of a RentalStore, in order of adding.
+
+    Supports the read-only list operations: indexing, slicing, len(),
+    iteration, membership and == against lists and other sequences. It
+    cannot be mutated and is not a list, so isinstance(view, list) is False.
+    First and last item, len() and membership are O(1), other positions
+    are O(index) as they are found by walking the catalogue. Use
+    list(store.products) to index many positions.
+
+    """
+
+    def __init__(self, products):
+        self._products = products
+
+    def __len__(self):
+        return len(self._products)
+
+    def __iter__(self):
+        return iter(self._products.values())
+
+    def __reversed__(self):
+        return reversed(self._products.values())
+
+    def __contains__(self, product):
+        return self._products.get(getattr(product, 'product_id', None)) is product
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._products.values())[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('product index out of range')
+        if index == len(self) - 1:
+            return next(reversed(self._products.values()))
+        return next(islice(self._products.values(), index, None))
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            product is item or product == item for product, item in zip(self, other))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class RentalStore():
     """
     Container to store products.
     
     Args:
         products (list): List of Products in store. Defaults to empty list.
+        clock (Clock): Optional. Source of the current date for the store,
+            its products and customers. Defaults to the system date.
+
+    Attributes:
+        clock (Clock): Source of the current date.
+        products (ProductList): Products in store, read-only. Use '+', '-'
+            or remove() to change them.
+        _products (dict): Products of the format {product_id: Product}.
+        _by_name (dict): Products per name of the format
+            {name: {product_id: Product}}, in order of adding.
+        _available (dict): Available products per exact type of the format
+            {type: {product_id: Product}}.
+        _expiry (list): Heap of (rental_end, sequence, product_id) of rented products.
 
     """
 
-    def __init__(self, products=None):
+    def __init__(self, products=None, clock=None):
         if isinstance(products, NoneType):
             products = []
             
         for product in products:
             assert isinstance(product, Product), 'Can only add Product Objects'
-        self.products = products
+        self.clock = clock or default_clock
+        self._products = {}
+        self._by_name = {}
+        self._available = {}
+        self._expiry = []
+        self._sequence = 0
+        for product in products:
+            self._index(product)
+
+    @property
+    def products(self):
+        """ProductList: Products in store, read-only."""
+        return ProductList(self._products)
+
+    def _index(self, product):
+        product.clock = self.clock
+        self._products[product.product_id] = product
+        self._by_name.setdefault(product.name, {})[product.product_id] = product
+        if product.available:
+            self._available.setdefault(type(product), {})[product.product_id] = product
+        else:
+            self._push(product)
+
+    def _push(self, product):
+        self._sequence += 1
+        heapq.heappush(self._expiry, (product.rental_end, self._sequence, product.product_id))
+
+    def mark_rented(self, product):
+        """Move a product that was just rented out of the available products."""
+        available = self._available.get(type(product), {})
+        if available.pop(product.product_id, None) is not None:
+            self._push(product)
+
+    def refresh(self):
+        """Move products whose rental has ended back to the available products.
+
+        Only the expired top of the expiry heap is looked at. A rental that
+        was extended meanwhile is pushed again with its new end.
+
+        """
+
+        today = self.clock.today()
+        expiry = self._expiry
+        while expiry and expiry[0][0] < today:
+            _, _, product_id = heapq.heappop(expiry)
+            product = self._products.get(product_id)
+            if product is None:
+                continue
+            available = self._available.setdefault(type(product), {})
+            if product_id in available:
+                continue
+            if product.available:
+                available[product_id] = product
+            else:
+                self._push(product)
+        return self
+
+    def available_products(self, kind=None):
+        """Return the products that can be rented now.
+
+        Costs O(available products) plus the rentals that ended since the
+        last call, independent of the catalogue size. Products rented
+        without the store, e.g. with Product.rent, are moved out of the
+        available products on the way.
+
+        Args:
+            kind (type): Optional. Product class, e.g. Laptop. Subclasses
+                are included. Defaults to all products.
+        Returns:
+            list: Available products.
+
+        """
+
+        with self.clock.frozen():
+            self.refresh()
+            candidates = [product
+                          for product_type, products in self._available.items()
+                          if kind is None or issubclass(product_type, kind)
+                          for product in products.values()]
+            return [product for product in candidates if self._is_available(product)]
+
+    def find(self, name):
+        """Return the first added product called name, None if there is none."""
+        products = self._by_name.get(name)
+        if products:
+            return next(iter(products.values()))
+        return None
+
+    def get(self, product_id):
+        """Return the product with product_id, None if it is not in store."""
+        return self._products.get(product_id)
+
+    def remove(self, product):
+        """Remove product from store.
+
+        Returns:
+            True if product was removed, False if it was not in store.
+
+        """
+
+        if self._products.get(product.product_id) is not product:
+            return False
+        del self._products[product.product_id]
+        self._available.get(type(product), {}).pop(product.product_id, None)
+        products = self._by_name[product.name]
+        del products[product.product_id]
+        if not products:
+            del self._by_name[product.name]
+        return True
         
+    def _is_available(self, product):
+        """Return True if product is indexed as available and still is.
+
+        An indexed product that was rented without the store is moved to
+        the expiry heap, see mark_rented.
+
+        """
+
+        if product.product_id not in self._available.get(type(product), ()):
+            return False
+        if product.available:
+            return True
+        self.mark_rented(product)
+        return False
+
+    def rent_many(self, customer, order):
+        """Rent many products to a customer at once, all or nothing.
+
+        Every item of the order is matched against the indexes: a name gets
+        the first available product of that name, a product type any
+        available product of that type. If one item cannot be rented,
+        nothing is rented. Nothing is printed.
+
+        Args:
+            customer (Customer): Customer of this store renting the products.
+            order (list): Items of the form (name_or_type, rental_time), e.g.
+                [(Laptop, 4), ('Test Product B 1', 2)].
+        Returns:
+            RentalResult: rented lists the rented products in order, failures
+                the (item, rental_time, reason) of all items that failed.
+                rented is empty if there are failures.
+
+        """
+
+        assert customer.store is self, 'Customer must belong to this store'
+        with self.clock.frozen():
+            return self._rent_many(customer, order)
+
+    def _rent_many(self, customer, order):
+        self.refresh()
+        taken = set()
+        pools = {}
+        reserved = []
+        failures = []
+        for item, rental_time in order:
+            if item not in pools:
+                if isinstance(item, type):
+                    candidates = self.available_products(item)
+                else:
+                    candidates = [product for product in self._by_name.get(item, {}).values()
+                                  if self._is_available(product)]
+                pools[item] = iter(candidates)
+            product = next((product for product in pools[item]
+                            if product.product_id not in taken), None)
+            if product is None:
+                failures.append((item, rental_time, 'not available'))
+                continue
+            state = (product._rental_time, product._rental_start)
+            try:
+                rented = product.rent(rental_time)
+            except AssertionError as error:
+                failures.append((item, rental_time, str(error)))
+                continue
+            taken.add(product.product_id)
+            if not rented:
+                failures.append((item, rental_time, 'not available'))
+                continue
+            reserved.append((product, state))
+
+        if failures:
+            # roll back the reserved products
+            for product, (rental_time, rental_start) in reserved:
+                product._rental_time = rental_time
+                product._rental_start = rental_start
+            return RentalResult([], failures)
+
+        for product, _ in reserved:
+            self.mark_rented(product)
+            customer._add_rental(product)
+        return RentalResult([product for product, _ in reserved], [])
+
     @staticmethod
     def display_impressum():
         """Display Impressum."""
@@ -27,10 +287,13 @@ class RentalStore():
         
     def display_products(self):
         """Display products with name, price per week and availability."""
-        for product in self.products:
-            print('{}: \t {:.2f}€ per week \t Available: {}'.format(product.name, 
-                                                                    product.price_per_week,
-                                                                    product.available))
+        with self.clock.frozen():
+            self.refresh()
+            for product in self.products:
+                available = self._is_available(product)
+                print('{}: \t {:.2f}€ per week \t Available: {}'.format(product.name, 
+                                                                        product.price_per_week,
+                                                                        available))
 
     def __len__(self):
         """Display number of products when len() is called."""
@@ -39,7 +302,8 @@ class RentalStore():
     def __add__(self, other): 
         """Add product to self.products via '+' operator."""
         assert isinstance(other, Product), 'Can only add Product Objects'
-        self.products.append(other)
+        assert other.product_id not in self._products, 'Product already in store'
+        self._index(other)
         print('{} added to store'.format(other.__repr__()))
         return self
     
@@ -47,11 +311,11 @@ class RentalStore():
         """Remove product from self.products via '-' operator."""
         assert isinstance(other, Product), 'Can only remove Product Objects'
         
-        for product in self.products:
-            if product.name == other.name:
-                self.products.remove(product)
-                return self
-            
+        product = self.find(other.name)
+        if product is not None:
+            self.remove(product)
+            return self
+
         print('{} cannot be removed, as it is not part of the store\'s products'.format(other.__repr__()))
         return self
             
@@ -0,0 +1,77 @@
+import pytest
+import datetime
+from clock import SimulatedClock, SystemClock
+from customer import Customer
+from store import RentalStore
+from products import Laptop, Phone
+
+
+@pytest.fixture
+def clock():
+    """Fixture for a SimulatedClock starting on 2024-01-01"""
+    return SimulatedClock(datetime.date(2024, 1, 1))
+
+
+def test_system_clock_frozen():
+    """Test that a frozen block returns one date."""
+    clock = SystemClock()
+    assert clock.today() == datetime.date.today()
+    with clock.frozen() as today:
+        with clock.frozen():
+            assert clock.today() == today
+        assert clock._frozen == today
+    assert clock._frozen is None
+
+
+def test_simulated_clock(clock):
+    """Test advancing the simulated clock."""
+    clock.advance(days=1, weeks=1)
+    assert clock.today() == datetime.date(2024, 1, 9)
+    with clock.frozen():
+        clock.advance(days=1)
+        assert clock.today() == datetime.date(2024, 1, 9)
+    assert clock.today() == datetime.date(2024, 1, 10)
+    with pytest.raises(AssertionError):
+        clock.advance(days=-1)
+
+
+def test_store_uses_clock(clock):
+    """Test that products of a store rent and expire on the store's clock."""
+    laptop = Laptop('Test Product A 1', 10)
+    store = RentalStore([laptop], clock)
+    customer = Customer('Tina Tester', store)
+    customer.rent(laptop.name, 2)
+    assert laptop.rental_start == datetime.date(2024, 1, 1)
+    
+    # extended before its end, so it stays rented
+    clock.advance(weeks=1)
+    assert customer.current_items == [laptop]
+    laptop.rental_time = 4
+    clock.advance(weeks=2)
+    assert customer.current_items == [laptop]
+    assert store.available_products() == []
+    
+    clock.advance(weeks=1, days=1)
+    assert customer.due_items == [laptop]
+    assert customer.invoice == 40
+    assert store.available_products() == [laptop]
+
+
+def test_simulated_year_of_rentals(clock):
+    """Test a year of weekly bulk rentals against a simulated clock."""
+    laptops = [Laptop('Laptop {}'.format(i), 10) for i in range(20)]
+    phones = [Phone('Phone {}'.format(i), 5) for i in range(10)]
+    store = RentalStore(laptops + phones, clock)
+    customer = Customer('Corporate Client', store)
+    for week in range(52):
+        result = store.rent_many(customer, [(Laptop, 3), (Phone, 1)])
+        assert result.failures == []
+        clock.advance(weeks=1)
+        if customer.invoice:
+            customer.pay_invoice(customer.invoice)
+    clock.advance(weeks=4)
+    assert len(store.available_products()) == 30
+    assert customer.current_items == []
+    # the laptops rented in the last two weeks are not paid yet
+    assert len(customer.due_items) == 2
+    assert customer.invoice == 60
@@ -1,5 +1,6 @@
 import pytest
 import datetime
+from clock import SimulatedClock
 from customer import Customer
 from store import RentalStore
 from products import Laptop, Phone
@@ -165,4 +166,99 @@ def test_customer_buy(demo_customer, products):
 #        
 #    # test already rented items
 #    with pytest.raises(AssertionError):
-#        demo_customer.buy(demo_product_2.name)    
\ No newline at end of file
+#        demo_customer.buy(demo_product_2.name)    
+
+def test_customer_rental_buckets(demo_customer, products):
+    """Test that items move from current to due to paid with a running invoice."""
+    laptop_1, laptop_2, phone = products
+    demo_customer.rent(laptop_1.name, 2)
+    demo_customer.rent(laptop_2.name, 3)
+    demo_customer.rent(phone.name, 1)
+    
+    # backdate rentals, laptop_2 has ended and phone was extended
+    laptop_2._rental_start = datetime.date.today() - datetime.timedelta(weeks=4)
+    phone.rental_time = 3
+    phone._rental_start = datetime.date.today() - datetime.timedelta(weeks=2)
+    assert demo_customer.current_items == [laptop_1, phone]
+    assert demo_customer.due_items == [laptop_2]
+    assert demo_customer.invoice == 30
+    
+    demo_customer.pay_invoice(30)
+    assert demo_customer.invoice == 0
+    assert demo_customer.due_items == []
+    assert demo_customer.paid_items == [laptop_2]
+
+
+def test_customer_rents_product_again(products):
+    """Test that a product rented again after its rental is billed once per rental."""
+    laptop = products[1]
+    clock = SimulatedClock(datetime.date(2024, 1, 1))
+    customer = Customer('Tina Tester', RentalStore([laptop], clock))
+    customer.rent(laptop.name, 1)
+    clock.advance(weeks=1, days=1)
+    assert customer.due_items == [laptop]
+    
+    customer.rent(laptop.name, 1)
+    assert customer.current_items == [laptop]
+    assert customer.due_items == [laptop]
+    clock.advance(weeks=1, days=1)
+    assert customer.current_items == []
+    assert customer.due_items == [laptop, laptop]
+    assert customer.invoice == sum(item.rental_time * item.price_per_week
+                                   for item in customer.due_items) == 20
+    
+    customer.pay_invoice(20)
+    assert customer.paid_items == [laptop, laptop]
+
+
+def test_customer_keeps_own_rental_terms(products):
+    """Test that a later rental by another customer does not change a rental."""
+    laptop = products[1]
+    clock = SimulatedClock(datetime.date(2024, 1, 1))
+    store = RentalStore([laptop], clock)
+    first, second = Customer('Tina Tester', store), Customer('Tobias Tester', store)
+    first.rent(laptop.name, 1)
+    clock.advance(weeks=2)
+    second.rent(laptop.name, 10)
+    assert first.current_items == []
+    assert first.due_items == [laptop]
+    assert first.invoice == 10
+    assert second.current_items == [laptop]
+    clock.advance(weeks=10)
+    assert first.invoice == 10
+    assert second.invoice == 100
+
+
+def test_store_rent_many(demo_customer, store, products):
+    """Test renting a whole order at once."""
+    laptop_1, laptop_2, phone = products
+    result = store.rent_many(demo_customer, [(Laptop, 4), ('Test Product B 1', 2)])
+    assert result.rented == [laptop_1, phone]
+    assert result.failures == []
+    assert demo_customer.current_items == [laptop_1, phone]
+    assert store.available_products() == [laptop_2]
+
+
+def test_store_rent_many_is_atomic(demo_customer, store, products, capsys):
+    """Test that an order with one failing item rents nothing and prints nothing."""
+    laptop_1, laptop_2, phone = products
+    result = store.rent_many(demo_customer, [(Laptop, 4), (Laptop, 13),
+                                             ('Test Product B 1', 2), ('Toaster', 1),
+                                             ('Test Product B 1', 1)])
+    assert result.rented == []
+    assert [failure[0] for failure in result.failures] == [Laptop, 'Toaster', 'Test Product B 1']
+    assert all(product.available for product in products)
+    assert demo_customer.current_items == []
+    assert len(store.available_products()) == 3
+    assert capsys.readouterr().out == ''
+
+
+def test_store_rent_many_checks_rent_result(demo_customer, store, products):
+    """Test that a product refusing the rental fails the order."""
+    laptop_1, laptop_2, phone = products
+    laptop_1.rent = lambda rental_time: False
+    result = store.rent_many(demo_customer, [(Laptop, 3), (Laptop, 3)])
+    assert result.rented == []
+    assert result.failures == [(Laptop, 3, 'not available')]
+    assert laptop_2.available
+    assert demo_customer.current_items == []
@@ -1,4 +1,5 @@
 import pytest
+from clock import SimulatedClock
 from store import RentalStore
 from products import Product, Laptop, Phone
 
@@ -86,3 +87,84 @@ def test_rentalstore_substract_product_returns_store(store):
     assert isinstance(result, RentalStore)
     assert len(result) == 2
     
+
+
+def test_rentalstore_indexes(store):
+    """Test lookup of products by name and by product_id."""
+    first = store.products[0]
+    twin = Laptop('Test Product A 1')
+    store + twin
+    assert store.find('Test Product A 1') is first
+    assert store.get(twin.product_id) is twin
+    assert store.find('Toaster') is None
+    
+    store - twin
+    assert store.get(first.product_id) is None
+    assert store.find('Test Product A 1') is twin
+    assert store.remove(first) == False
+    assert store.remove(twin) == True
+    assert store.find('Test Product A 1') is None
+    assert len(store) == 2
+    
+    
+def test_rentalstore_products_view(store):
+    """Test the read-only list view on the products."""
+    names = [product.name for product in store.products]
+    assert names == ['Test Product A 1', 'Test Product A 2', 'Test Product B 1']
+    assert store.products[1].name == 'Test Product A 2'
+    assert store.products[-3].name == 'Test Product A 1'
+    assert [product.name for product in store.products[1:]] == names[1:]
+    assert store.products[2] in store.products
+    assert store.products == list(store.products) == store.products
+    assert store.products != list(store.products)[:2]
+    assert RentalStore().products == []
+    with pytest.raises(IndexError):
+        store.products[3]
+    with pytest.raises(AssertionError):
+        store + store.products[0]
+    
+    
+def test_rentalstore_available_products(store):
+    """Test the availability index and lazy expiry of rentals."""
+    laptop, _, phone = store.products
+    store.clock = clock = SimulatedClock()
+    for product in store.products:
+        product.clock = clock
+    assert store.available_products(Laptop) == list(store.products)[:2]
+    assert store.available_products(Phone) == [phone]
+    
+    laptop.rent(2)
+    store.mark_rented(laptop)
+    assert laptop not in store.available_products()
+    assert len(store.available_products(Product)) == 2
+    
+    # not expired yet, then extended before the old end
+    clock.advance(weeks=2)
+    assert laptop not in store.available_products(Laptop)
+    laptop.rental_time = 4
+    clock.advance(days=1)
+    assert laptop not in store.available_products(Laptop)
+    
+    # expired
+    clock.advance(weeks=2)
+    assert laptop in store.available_products(Laptop)
+
+
+def test_rentalstore_product_rented_outside_store(capsys):
+    """Test that products rented with Product.rent are not listed as available."""
+    clock = SimulatedClock()
+    laptop, phone = Laptop('Test Product A 1'), Phone('Test Product B 1', 5.2)
+    store = RentalStore([laptop, phone], clock)
+    phone.rent(1)
+    assert store.available_products() == [laptop]
+    store.display_products()
+    assert 'Test Product B 1: \t 5.20€ per week \t Available: False' in capsys.readouterr().out
+    
+    laptop.rent(1)
+    store.display_products()
+    assert 'Test Product A 1: \t 0.00€ per week \t Available: False' in capsys.readouterr().out
+    assert store.available_products() == []
+    
+    # back in the index once the rentals ended
+    clock.advance(weeks=1, days=1)
+    assert store.available_products() == [laptop, phone]